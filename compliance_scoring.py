@@ -0,0 +1,232 @@
+"""
+Compliance Scoring Module - Stored area scores and local weighted re-scoring
+
+Area scores from each assessment are stored per document, so overall scores
+can be recomputed with any weight profile without another model call. With
+numpy installed, scoring many documents is a single matrix-vector product.
+"""
+
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# Compliance areas, in score-matrix column order
+SCORE_AREAS = (
+    "document_control",
+    "hrcw_identification",
+    "hazard_identification",
+    "control_measures",
+    "monitoring_review",
+    "consultation"
+)
+
+# Built-in weight profiles; "default" is the weighting get_compliance_score has always used
+WEIGHT_PROFILES = {
+    "default": {
+        "document_control": 0.10,
+        "hrcw_identification": 0.25,  # Critical for safety
+        "hazard_identification": 0.20,
+        "control_measures": 0.25,  # Critical for safety
+        "monitoring_review": 0.10,
+        "consultation": 0.10
+    },
+    "equal": {area: 1 / 6 for area in SCORE_AREAS},
+    "safety_critical": {
+        "document_control": 0.05,
+        "hrcw_identification": 0.30,
+        "hazard_identification": 0.25,
+        "control_measures": 0.30,
+        "monitoring_review": 0.05,
+        "consultation": 0.05
+    }
+}
+
+# JSON file of extra named profiles (e.g. per client or per jurisdiction): {"name": {area: weight}}
+WEIGHT_PROFILES_FILE = os.getenv("SWMS_WEIGHT_PROFILES")
+# Where area scores are stored per document
+AREA_SCORES_PATH = Path(os.getenv("SWMS_AREA_SCORES_PATH", "/tmp/swms-area-scores.json"))
+
+# Lower bounds of each compliance level, highest first
+COMPLIANCE_LEVELS = (
+    (76, "Fully Compliant"),
+    (51, "Mostly Compliant"),
+    (26, "Partially Compliant"),
+    (0, "Non-Compliant")
+)
+
+
+def compliance_level(overall_score: float) -> str:
+    """Compliance level for an overall 0-100 score"""
+    for threshold, level in COMPLIANCE_LEVELS:
+        if overall_score >= threshold:
+            return level
+    return COMPLIANCE_LEVELS[-1][1]
+
+
+def load_weight_profiles() -> Dict[str, Dict[str, float]]:
+    """Built-in profiles plus any from SWMS_WEIGHT_PROFILES (which may override them)"""
+    profiles = dict(WEIGHT_PROFILES)
+    if WEIGHT_PROFILES_FILE:
+        try:
+            with open(WEIGHT_PROFILES_FILE, 'r') as f:
+                profiles.update(json.load(f))
+        except Exception as e:
+            print(f"Warning: Could not load weight profiles from {WEIGHT_PROFILES_FILE}: {e}")
+    return profiles
+
+
+def normalize_weights(weights: Dict[str, float]) -> Dict[str, float]:
+    """
+    Validate a weight profile and scale it to sum to 1.
+
+    Raises:
+        ValueError: For unknown areas, negative weights or an all-zero profile
+    """
+    unknown = [area for area in weights if area not in SCORE_AREAS]
+    if unknown:
+        raise ValueError(f"Unknown compliance areas: {unknown}. Valid areas: {list(SCORE_AREAS)}")
+    if any(weight < 0 for weight in weights.values()):
+        raise ValueError("Weights must not be negative")
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("Weights must not all be zero")
+    return {area: weights.get(area, 0) / total for area in SCORE_AREAS}
+
+
+def weighted_scores(score_rows: List[List[float]], weights: Dict[str, float]) -> List[float]:
+    """
+    Overall scores for many documents at once.
+
+    Args:
+        score_rows: One row per document of area scores in SCORE_AREAS order (missing areas as 0)
+        weights: Normalized weights keyed by area
+    """
+    weight_vector = [weights[area] for area in SCORE_AREAS]
+    if NUMPY_AVAILABLE:
+        return (np.asarray(score_rows, dtype=float).reshape(-1, len(SCORE_AREAS)) @ np.asarray(weight_vector)).tolist()
+    return [sum(score * weight for score, weight in zip(row, weight_vector)) for row in score_rows]
+
+
+class AreaScoreStore:
+    """Area scores per document, kept in memory and persisted as JSON"""
+
+    def __init__(self, path: Path = AREA_SCORES_PATH):
+        self.path = Path(path)
+        self.documents: Dict[str, Dict[str, Any]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """Load stored scores from disk"""
+        if self.path.exists():
+            try:
+                with open(self.path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Warning: Could not load area scores from {self.path}: {e}")
+        return {}
+
+    def _save(self):
+        """Write stored scores to disk atomically"""
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.documents, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Warning: Could not save area scores to {self.path}: {e}")
+
+    def put(
+        self,
+        document_id: str,
+        scores: Dict[str, float],
+        content_hash: Optional[str] = None,
+        jurisdiction: Optional[str] = None
+    ):
+        """Store a document's area scores (0-100 per area)"""
+        entry = {
+            "scores": {area: scores[area] for area in SCORE_AREAS if area in scores},
+            "content_hash": content_hash,
+            "jurisdiction": jurisdiction
+        }
+        existing = self.documents.get(document_id)
+        if existing and {key: existing.get(key) for key in entry} == entry:
+            return
+        self.documents[document_id] = dict(entry, stored_at=time.time())
+        self._save()
+
+    def remove(self, document_ids: List[str]) -> int:
+        """Drop the entries of documents that no longer exist; returns how many were dropped"""
+        removed = [document_id for document_id in document_ids if self.documents.pop(document_id, None)]
+        if removed:
+            self._save()
+        return len(removed)
+
+    def prune(self, max_age_seconds: float) -> int:
+        """Drop entries stored more than max_age_seconds ago; returns how many were dropped"""
+        cutoff = time.time() - max_age_seconds
+        return self.remove([
+            document_id for document_id, entry in self.documents.items()
+            if entry.get("stored_at", 0) < cutoff
+        ])
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Stored entry for a document, or None"""
+        return self.documents.get(document_id)
+
+    def rescore(
+        self,
+        weights: Dict[str, float],
+        document_ids: Optional[List[str]] = None,
+        jurisdiction: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Overall scores and compliance levels from stored area scores, with no model calls.
+
+        Args:
+            weights: Normalized weights keyed by area
+            document_ids: Documents to score (default: every stored document)
+            jurisdiction: Only score documents assessed for this jurisdiction
+        """
+        if document_ids is None:
+            document_ids = list(self.documents)
+        found = [
+            document_id for document_id in document_ids
+            if document_id in self.documents
+            and (not jurisdiction or self.documents[document_id].get("jurisdiction") == jurisdiction)
+        ]
+        missing = [document_id for document_id in document_ids if document_id not in self.documents]
+
+        rows = [
+            [self.documents[document_id]["scores"].get(area, 0) for area in SCORE_AREAS]
+            for document_id in found
+        ]
+        overall = weighted_scores(rows, weights) if rows else []
+
+        results = {
+            document_id: {
+                "overall_score": round(score, 1),
+                "compliance_level": compliance_level(score)
+            }
+            for document_id, score in zip(found, overall)
+        }
+        level_counts: Dict[str, int] = {}
+        for result in results.values():
+            level_counts[result["compliance_level"]] = level_counts.get(result["compliance_level"], 0) + 1
+
+        return {
+            "results": results,
+            "missing": missing,
+            "summary": {
+                "documents_scored": len(results),
+                "mean_score": round(sum(overall) / len(overall), 1) if overall else None,
+                "compliance_levels": level_counts
+            }
+        }
@@ -0,0 +1,242 @@
+"""
+Document Registry Module - Persistent record of uploaded SWMS documents
+
+Every upload is recorded in SQLite: filename, content hash, size, MIME type,
+Gemini file name and URI, local copy, upload time and expiry. Expiry is
+indexed, so cleanup only touches expired rows. The content hash is indexed
+as well, so a re-upload of the same bytes returns the existing live Gemini
+document_id instead of creating a new Gemini file.
+"""
+
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Gemini deletes uploaded files after 48 hours
+GEMINI_FILE_TTL_HOURS = 48
+# Files closer than this to expiry are uploaded again rather than reused
+MIN_REMAINING_SECONDS = int(os.getenv("SWMS_UPLOAD_REUSE_MIN_REMAINING_SECONDS", "3600"))
+# Files API status codes meaning the file is gone (a deleted file is reported as 403)
+FILE_GONE_STATUS_CODES = (403, 404)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    filename TEXT,
+    sha256 TEXT NOT NULL,
+    size_bytes INTEGER,
+    mime_type TEXT,
+    gemini_uri TEXT,
+    file_path TEXT,
+    source TEXT,
+    uploaded_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    reuse_count INTEGER NOT NULL DEFAULT 0,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS documents_expires_at ON documents (expires_at);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256, expires_at);
+"""
+
+COLUMNS = (
+    "document_id", "filename", "sha256", "size_bytes", "mime_type", "gemini_uri",
+    "file_path", "source", "uploaded_at", "expires_at", "reuse_count", "last_used"
+)
+
+
+def file_expiry(gemini_file: Any) -> float:
+    """Expiry timestamp of a Gemini file, assuming the standard TTL if it is not reported"""
+    expiration_time = getattr(gemini_file, "expiration_time", None)
+    if expiration_time is not None:
+        try:
+            return expiration_time.timestamp()
+        except Exception:
+            pass
+    return time.time() + GEMINI_FILE_TTL_HOURS * 3600
+
+
+class DocumentRegistry:
+    """SQLite-backed registry of uploaded documents, shared by all upload paths"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # One connection guarded by a lock; WAL and a busy timeout let other processes share the file
+        self._db = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db_lock = threading.Lock()
+        with self._db_lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA busy_timeout=5000")
+            self._db.executescript(SCHEMA)
+        self._hash_locks: Dict[str, asyncio.Lock] = {}
+        # Holders and waiters per hash lock, so a lock is dropped once nobody uses it
+        self._hash_lock_users: Dict[str, int] = {}
+        self.counters = {"reused": 0, "uploaded": 0, "stale": 0, "expired": 0}
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """Run one statement and return its rows"""
+        with self._db_lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @asynccontextmanager
+    async def locked(self, content_hash: str):
+        """
+        Hold the lock for one content hash; hold it across find() and record()
+        so concurrent uploads of the same bytes create a single Gemini file.
+        """
+        lock = self._hash_locks.get(content_hash)
+        if lock is None:
+            lock = self._hash_locks[content_hash] = asyncio.Lock()
+        self._hash_lock_users[content_hash] = self._hash_lock_users.get(content_hash, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._hash_lock_users[content_hash] -= 1
+            if not self._hash_lock_users[content_hash]:
+                del self._hash_lock_users[content_hash]
+                del self._hash_locks[content_hash]
+
+    def _forget(self, document_id: str):
+        """Drop the row (and local copy) of a Gemini file that can no longer be used"""
+        rows = self._execute("SELECT file_path FROM documents WHERE document_id = ?", (document_id,))
+        self._execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+        file_path = rows[0]["file_path"] if rows else None
+        if file_path:
+            try:
+                Path(file_path).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"Warning: Could not delete local copy {file_path}: {e}")
+        self.counters["stale"] += 1
+
+    async def find(self, gateway, content_hash: str) -> Optional[Any]:
+        """
+        The live Gemini file previously uploaded for these bytes, or None.
+
+        The file is confirmed with the Files API, so a file Gemini has already
+        deleted (or that failed processing) is never returned. Only those are
+        forgotten; if the lookup fails for another reason (network, rate limit)
+        the row is kept and None is returned, so the caller uploads afresh.
+        """
+        rows = self._execute(
+            "SELECT document_id FROM documents WHERE sha256 = ? AND expires_at > ? "
+            "ORDER BY expires_at DESC LIMIT 1",
+            (content_hash, time.time() + MIN_REMAINING_SECONDS)
+        )
+        if not rows:
+            return None
+        document_id = rows[0]["document_id"]
+        try:
+            gemini_file = await gateway.get_file(document_id)
+        except Exception as e:
+            if getattr(e, "code", None) in FILE_GONE_STATUS_CODES:
+                self._forget(document_id)
+            else:
+                print(f"Warning: Could not confirm {document_id} for reuse: {e}")
+            return None
+        if "FAILED" in str(getattr(gemini_file, "state", "")):
+            self._forget(document_id)
+            return None
+
+        self._execute(
+            "UPDATE documents SET reuse_count = reuse_count + 1, last_used = ? WHERE document_id = ?",
+            (time.time(), document_id)
+        )
+        self.counters["reused"] += 1
+        return gemini_file
+
+    def record(
+        self,
+        content_hash: str,
+        gemini_file: Any,
+        size_bytes: int,
+        filename: Optional[str] = None,
+        file_path: Optional[str] = None,
+        source: Optional[str] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        """
+        Register a newly uploaded document.
+
+        Args:
+            content_hash: SHA-256 of the original bytes (before any conversion)
+            gemini_file: The uploaded Gemini file
+            size_bytes: Size of the uploaded bytes
+            filename: Name the document was uploaded as
+            file_path: Local copy to delete when the document expires
+            source: Where the document came from (URL, path or upload route)
+            ttl_seconds: Local retention; the row never outlives the Gemini file
+        """
+        now = time.time()
+        expires_at = file_expiry(gemini_file)
+        if ttl_seconds is not None:
+            expires_at = min(expires_at, now + ttl_seconds)
+        self._execute(
+            "INSERT OR REPLACE INTO documents "
+            "(document_id, filename, sha256, size_bytes, mime_type, gemini_uri, file_path, source, "
+            "uploaded_at, expires_at, reuse_count, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?)",
+            (
+                gemini_file.name,
+                filename or getattr(gemini_file, "display_name", None),
+                content_hash,
+                size_bytes,
+                getattr(gemini_file, "mime_type", None),
+                getattr(gemini_file, "uri", None),
+                file_path,
+                source,
+                now,
+                expires_at,
+                now
+            )
+        )
+        self.counters["uploaded"] += 1
+
+    def pop_expired(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Remove and return expired rows (an index range scan, not a full table scan)"""
+        now = time.time() if now is None else now
+        with self._db_lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._db.execute(
+                    "SELECT * FROM documents WHERE expires_at <= ?", (now,)
+                ).fetchall()
+                self._db.execute("DELETE FROM documents WHERE expires_at <= ?", (now,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        self.counters["expired"] += len(rows)
+        return [dict(row) for row in rows]
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Row for a document, or None"""
+        rows = self._execute("SELECT * FROM documents WHERE document_id = ?", (document_id,))
+        return dict(rows[0]) if rows else None
+
+    def list(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Live documents, most recently uploaded first"""
+        rows = self._execute(
+            "SELECT * FROM documents WHERE expires_at > ? ORDER BY uploaded_at DESC LIMIT ? OFFSET ?",
+            (time.time(), limit, offset)
+        )
+        return [dict(row) for row in rows]
+
+    def count(self) -> int:
+        """Number of live documents"""
+        return self._execute("SELECT COUNT(*) FROM documents WHERE expires_at > ?", (time.time(),))[0][0]
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus the number of live documents"""
+        return {**self.counters, "registered_documents": self.count()}
+
+    def close(self):
+        """Close the database connection"""
+        with self._db_lock:
+            self._db.close()
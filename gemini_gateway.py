@@ -0,0 +1,182 @@
+"""
+Gemini Gateway Module - Process-wide Gemini client, HTTP pool and regulatory context
+
+Server routes and tools share one gateway, so the API client, its TLS
+connections and the R2 context manager (with its file cache) are set up once
+per process rather than on every call. Model calls also share one rate limiter.
+"""
+
+import os
+import httpx
+from typing import Any, List, Optional, Union
+from pathlib import Path
+from google import genai
+from google.genai import types
+
+from r2_context import R2ContextManager, R2_MAX_CONCURRENT_FETCHES, R2_FETCH_TIMEOUT_SECONDS, estimate_file_tokens
+from rate_limiter import RateLimiter
+from ingestion import DOWNLOAD_MAX_CONNECTIONS, DOWNLOAD_TIMEOUT_SECONDS
+
+# Assumed output size when a request does not set max_output_tokens
+DEFAULT_OUTPUT_TOKEN_ESTIMATE = 4000
+
+
+class GeminiGateway:
+    """Owns the shared Gemini client, HTTP connection pool and R2 context manager"""
+
+    def __init__(self, api_key: Optional[str] = None):
+        """
+        Initialize without connecting; everything is created on first use.
+
+        The API key defaults to GEMINI_API_KEY or GOOGLE_API_KEY, read when the
+        client is first needed so .env files loaded after import still apply.
+        """
+        self._api_key = api_key
+        self._client: Optional[genai.Client] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._download_client: Optional[httpx.AsyncClient] = None
+        self._context: Optional[R2ContextManager] = None
+        self.rate_limiter = RateLimiter()
+
+    @property
+    def api_key(self) -> Optional[str]:
+        """The Gemini API key, from the constructor or the environment"""
+        return self._api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+
+    @property
+    def configured(self) -> bool:
+        """Check if a Gemini API key is available"""
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> genai.Client:
+        """The shared Gemini client"""
+        if self._client is None:
+            if not self.configured:
+                raise RuntimeError("Gemini API key not configured")
+            self._client = genai.Client(api_key=self.api_key)
+        return self._client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The shared keep-alive HTTP client for regulatory document fetches"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=R2_MAX_CONCURRENT_FETCHES,
+                    max_keepalive_connections=R2_MAX_CONCURRENT_FETCHES
+                ),
+                timeout=httpx.Timeout(R2_FETCH_TIMEOUT_SECONDS),
+                follow_redirects=True
+            )
+        return self._http_client
+
+    @property
+    def download_client(self) -> httpx.AsyncClient:
+        """
+        The shared keep-alive HTTP client for SWMS downloads, pooled separately
+        so long user downloads never hold up regulatory document fetches.
+        """
+        if self._download_client is None or self._download_client.is_closed:
+            self._download_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=DOWNLOAD_MAX_CONNECTIONS,
+                    max_keepalive_connections=DOWNLOAD_MAX_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(DOWNLOAD_TIMEOUT_SECONDS),
+                follow_redirects=True
+            )
+        return self._download_client
+
+    @property
+    def context(self) -> R2ContextManager:
+        """The shared regulatory context manager"""
+        if self._context is None:
+            self._context = R2ContextManager(self.client, http_client=self.http_client)
+        return self._context
+
+    async def generate(
+        self,
+        model: str,
+        contents: Union[List[Any], Any],
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> types.GenerateContentResponse:
+        """
+        Generate content with the shared async client.
+        
+        Calls queue behind the model's rate limit and throttled attempts are
+        retried, so callers only see errors that persist past the retry budget.
+        """
+        return await self.rate_limiter.call(
+            model,
+            lambda: self.client.aio.models.generate_content(
+                model=model,
+                contents=contents,
+                config=config
+            ),
+            self.estimate_request_tokens(contents, config)
+        )
+
+    def estimate_request_tokens(
+        self,
+        contents: Union[List[Any], Any],
+        config: Optional[types.GenerateContentConfig] = None
+    ) -> int:
+        """Rough prompt plus output tokens for rate limiting, before usage is known"""
+        items = contents if isinstance(contents, list) else [contents]
+        tokens = 0
+        for item in items:
+            if isinstance(item, str):
+                tokens += len(item) // 4
+            elif getattr(item, "size_bytes", None):
+                tokens += estimate_file_tokens(item.size_bytes, item.mime_type or "application/pdf")
+            elif getattr(item, "text", None):
+                tokens += len(item.text) // 4
+            else:
+                # File parts referenced by URI carry no size; assume a short document
+                tokens += estimate_file_tokens(0)
+        max_output = getattr(config, "max_output_tokens", None) if config else None
+        return tokens + (max_output or DEFAULT_OUTPUT_TOKEN_ESTIMATE)
+
+    async def upload(
+        self,
+        file: Union[str, Path, Any],
+        mime_type: Optional[str] = None,
+        display_name: Optional[str] = None
+    ) -> types.File:
+        """Upload a file (path or file-like object) to the Gemini Files API"""
+        return await self.client.aio.files.upload(
+            file=str(file) if isinstance(file, Path) else file,
+            config=types.UploadFileConfig(mime_type=mime_type, display_name=display_name)
+        )
+
+    async def get_file(self, name: str) -> types.File:
+        """Look up an uploaded Gemini file by name, e.g. "files/abc123" """
+        return await self.client.aio.files.get(name=name)
+
+    async def close(self):
+        """
+        Release the HTTP pools and the context manager's storage backend.
+
+        The context manager itself is kept (callers hold references to it);
+        its pools are reopened on next use.
+        """
+        if self._context is not None:
+            await self._context.close()
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+        if self._download_client is not None and not self._download_client.is_closed:
+            await self._download_client.aclose()
+        self._download_client = None
+
+
+_gateway: Optional[GeminiGateway] = None
+
+
+def get_gateway() -> GeminiGateway:
+    """Return the process-wide gateway, creating it on first use"""
+    global _gateway
+    if _gateway is None:
+        _gateway = GeminiGateway()
+    return _gateway
@@ -0,0 +1,443 @@
+"""
+Ingestion Module - Streaming intake of uploaded SWMS documents
+
+Every upload source ends up as a document on local disk with its size,
+SHA-256 and type: multipart bodies and URL downloads are spooled to disk
+chunk by chunk (rejected as soon as they cross the size limit), decoded
+base64 content is written once, and local files are hashed in place. Memory
+per upload stays constant.
+"""
+
+import os
+import uuid
+import hashlib
+import zipfile
+import mimetypes
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import httpx
+from starlette.requests import Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Largest accepted SWMS document
+MAX_UPLOAD_MB = float(os.getenv("SWMS_MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+# Allowance for multipart boundaries, part headers and small form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Connection pool and deadline for downloading SWMS documents from URLs
+DOWNLOAD_MAX_CONNECTIONS = int(os.getenv("SWMS_DOWNLOAD_MAX_CONNECTIONS", "20"))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("SWMS_DOWNLOAD_TIMEOUT_SECONDS", "30"))
+# Read size for streamed downloads and for hashing local files
+READ_CHUNK_BYTES = 64 * 1024
+
+PDF_MIME_TYPE = "application/pdf"
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class UploadError(Exception):
+    """A malformed or empty upload"""
+
+
+class UnsupportedFileType(UploadError):
+    """An upload that is neither a PDF nor a Word (DOCX) document"""
+
+
+class UploadTooLarge(UploadError):
+    """An upload larger than the size limit"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large (max {max_bytes / (1024 * 1024):g}MB)")
+        self.max_bytes = max_bytes
+
+
+def upload_file_type(filename: str) -> Tuple[str, str]:
+    """File extension and MIME type for an uploaded filename"""
+    lower = filename.lower()
+    if lower.endswith('.pdf'):
+        return '.pdf', PDF_MIME_TYPE
+    if lower.endswith('.docx'):
+        return '.docx', DOCX_MIME_TYPE
+    mime_type, _ = mimetypes.guess_type(filename)
+    return Path(filename).suffix or '.bin', mime_type or 'application/octet-stream'
+
+
+def sniff_mime_type(head: bytes) -> Optional[str]:
+    """MIME type from a document's leading bytes (PDF, or DOCX as a ZIP package with word/ parts), or None"""
+    if head.startswith(b"%PDF-"):
+        return PDF_MIME_TYPE
+    # Part names are stored in the ZIP's local file headers, so other ZIP
+    # packages (spreadsheets, presentations, plain archives) are not taken for DOCX
+    if head.startswith(b"PK\x03\x04") and b"word/" in head:
+        return DOCX_MIME_TYPE
+    return None
+
+
+def check_docx_package(path: Path):
+    """
+    Confirm a DOCX is a Word package (a ZIP holding word/document.xml) before it is converted.
+
+    Raises:
+        UnsupportedFileType: If the file is not a ZIP or has no Word document part
+    """
+    try:
+        with zipfile.ZipFile(path) as package:
+            package.getinfo("word/document.xml")
+    except (zipfile.BadZipFile, KeyError):
+        raise UnsupportedFileType("File is not a valid DOCX document. Only PDF and DOCX are supported.")
+
+
+def declared_mime_type(content_type: str, filename: str) -> Optional[str]:
+    """MIME type from a Content-Type header, else the filename extension (PDF or DOCX only)"""
+    if 'pdf' in content_type:
+        return PDF_MIME_TYPE
+    if 'wordprocessingml' in content_type or 'msword' in content_type:
+        return DOCX_MIME_TYPE
+    extension = Path(filename).suffix.lower()
+    if extension == '.pdf':
+        return PDF_MIME_TYPE
+    if extension in ['.docx', '.doc']:
+        return DOCX_MIME_TYPE
+    return None
+
+
+def document_mime_type(head: bytes, filename: str, mime_type: Optional[str] = None) -> str:
+    """
+    MIME type of a PDF or DOCX document: an explicit type, else its magic bytes, else its extension.
+
+    Raises:
+        UnsupportedFileType: If the document is neither PDF nor DOCX
+    """
+    mime_type = mime_type or sniff_mime_type(head) or declared_mime_type("", filename)
+    if mime_type not in (PDF_MIME_TYPE, DOCX_MIME_TYPE):
+        raise UnsupportedFileType(
+            f"Unsupported file format: {Path(filename).suffix.lower()}. Only PDF and DOCX are supported."
+        )
+    return mime_type
+
+
+@dataclass
+class SpooledUpload:
+    """An upload written to local storage"""
+    path: Path
+    filename: str
+    mime_type: str
+    size: int
+    sha256: str
+
+    def discard(self):
+        """Delete the spooled file"""
+        self.path.unlink(missing_ok=True)
+
+
+class SpoolWriter:
+    """Writes chunks to a file while hashing them and enforcing a size limit"""
+
+    def __init__(self, path: Path, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(path, 'wb')
+
+    def write(self, chunk: bytes):
+        """
+        Append a chunk.
+
+        Raises:
+            UploadTooLarge: As soon as the total size exceeds max_bytes
+        """
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self._hash.update(chunk)
+        self._file.write(chunk)
+
+    @property
+    def sha256(self) -> str:
+        """Hex digest of the bytes written so far"""
+        return self._hash.hexdigest()
+
+    def close(self):
+        """Close the file, keeping it"""
+        if not self._file.closed:
+            self._file.close()
+
+    def discard(self):
+        """Close and delete the file"""
+        self.close()
+        self.path.unlink(missing_ok=True)
+
+
+class _MultipartFileReceiver:
+    """python-multipart callbacks that spool one named file field to disk"""
+
+    def __init__(self, field_name: str, directory: Path, max_bytes: int):
+        self.field_name = field_name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.writer: Optional[SpoolWriter] = None
+        self.filename: Optional[str] = None
+        self.complete = False
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition: Optional[bytes] = None
+        self._receiving = False
+
+    def callbacks(self):
+        """Callback mapping for MultipartParser"""
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished
+        }
+
+    def on_part_begin(self):
+        self._disposition = None
+        self._receiving = False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        if self.writer is not None or self._disposition is None:
+            return
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", "replace")
+        if name != self.field_name or b"filename" not in options:
+            return
+        self.filename = options[b"filename"].decode("utf-8", "replace") or "document"
+        ext, _ = upload_file_type(self.filename)
+        self.writer = SpoolWriter(self.directory / f"{uuid.uuid4()}{ext}", self.max_bytes)
+        self._receiving = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._receiving:
+            self.writer.write(data[start:end])
+
+    def on_part_end(self):
+        if self._receiving:
+            self._receiving = False
+            self.complete = True
+
+
+async def receive_multipart_file(
+    request: Request,
+    directory: Path,
+    field_name: str = "file",
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> SpooledUpload:
+    """
+    Stream a multipart/form-data request, spooling one file field to disk.
+
+    Args:
+        request: Incoming request with a multipart/form-data body
+        directory: Where to spool the file
+        field_name: Form field holding the file
+        max_bytes: Size limit for the file
+
+    Returns:
+        The spooled upload, with its size and SHA-256
+
+    Raises:
+        UploadTooLarge: Before reading the body if Content-Length is over the limit,
+            otherwise as soon as the streamed file crosses it
+        UploadError: If the body is not multipart, has no file field or the file is empty
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Expected multipart/form-data with a 'file' field")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+        raise UploadTooLarge(max_bytes)
+
+    receiver = _MultipartFileReceiver(field_name, directory, max_bytes)
+    parser = MultipartParser(boundary, receiver.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            # Stop reading once the file part has been received
+            if receiver.complete:
+                break
+        if receiver.writer is None:
+            raise UploadError("No file provided")
+        if not receiver.complete:
+            raise UploadError("Upload ended before the file was complete")
+        if receiver.writer.size == 0:
+            raise UploadError("Empty file")
+    except Exception as e:
+        if receiver.writer is not None:
+            receiver.writer.discard()
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError(f"Could not read upload: {e}")
+
+    writer = receiver.writer
+    writer.close()
+
+    _, mime_type = upload_file_type(receiver.filename)
+    return SpooledUpload(
+        path=writer.path,
+        filename=receiver.filename,
+        mime_type=mime_type,
+        size=writer.size,
+        sha256=writer.sha256
+    )
+
+
+async def download_to_spool(
+    http_client: httpx.AsyncClient,
+    url: str,
+    directory: Path,
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> SpooledUpload:
+    """
+    Stream a PDF or DOCX document from a URL to disk.
+
+    The type is sniffed from the first chunk's magic bytes (falling back to the
+    Content-Type header and the URL's extension), and the body is hashed and
+    size-checked as it arrives.
+
+    Args:
+        http_client: Shared HTTP client to download with
+        url: Document URL
+        directory: Where to spool the file
+        max_bytes: Size limit for the document
+
+    Returns:
+        The spooled download, with its size and SHA-256
+
+    Raises:
+        UploadTooLarge: Before reading the body if Content-Length is over the limit,
+            otherwise as soon as the streamed body crosses it
+        UploadError: If the download fails, the type is unsupported or the body is empty
+    """
+    url_filename = unquote(Path(urlparse(url).path).name)
+    filename = url_filename if '.' in url_filename else "document.pdf"  # Default name
+
+    writer: Optional[SpoolWriter] = None
+    try:
+        async with http_client.stream("GET", url) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise UploadTooLarge(max_bytes)
+
+            async for chunk in response.aiter_bytes(READ_CHUNK_BYTES):
+                if writer is None:
+                    mime_type = sniff_mime_type(chunk) or declared_mime_type(
+                        response.headers.get('content-type', ''), url_filename
+                    )
+                    if mime_type is None:
+                        raise UnsupportedFileType("Could not determine file type from URL. Ensure it's a PDF or DOCX file.")
+                    ext = '.pdf' if mime_type == PDF_MIME_TYPE else '.docx'
+                    if not filename.lower().endswith(ext):
+                        filename = filename.split('.')[0] + ext
+                    writer = SpoolWriter(directory / f"{uuid.uuid4()}{ext}", max_bytes)
+                writer.write(chunk)
+    except Exception as e:
+        if writer is not None:
+            writer.discard()
+        if isinstance(e, UploadError):
+            raise
+        raise UploadError(f"Failed to download from URL: {e}")
+
+    if writer is None:
+        raise UploadError("Downloaded file is empty")
+    writer.close()
+    return SpooledUpload(
+        path=writer.path,
+        filename=filename,
+        mime_type=mime_type,
+        size=writer.size,
+        sha256=writer.sha256
+    )
+
+
+def spool_bytes(
+    data: bytes,
+    filename: str,
+    directory: Path,
+    mime_type: Optional[str] = None,
+    max_bytes: int = MAX_UPLOAD_BYTES
+) -> SpooledUpload:
+    """
+    Write an in-memory document (e.g. decoded base64 content) to disk once.
+
+    Raises:
+        UploadTooLarge: If the document is over the size limit
+        UploadError: If it is empty or neither PDF nor DOCX
+    """
+    if not data:
+        raise UploadError("Empty file")
+    if len(data) > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    mime_type = document_mime_type(data[:READ_CHUNK_BYTES], filename, mime_type)
+    writer = SpoolWriter(directory / f"{uuid.uuid4()}{'.pdf' if mime_type == PDF_MIME_TYPE else '.docx'}", max_bytes)
+    try:
+        writer.write(data)
+    finally:
+        writer.close()
+    return SpooledUpload(
+        path=writer.path,
+        filename=filename,
+        mime_type=mime_type,
+        size=writer.size,
+        sha256=writer.sha256
+    )
+
+
+def inspect_local_file(path: Path, max_bytes: int = MAX_UPLOAD_BYTES) -> SpooledUpload:
+    """
+    Size, SHA-256 and type of a document already on disk, read in chunks and left in place.
+
+    Raises:
+        UploadTooLarge: As soon as the file is found to be over the size limit
+        UploadError: If it is empty or neither PDF nor DOCX
+    """
+    path = Path(path)
+    if path.stat().st_size > max_bytes:
+        raise UploadTooLarge(max_bytes)
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        head = f.read(READ_CHUNK_BYTES)
+        chunk = head
+        while chunk:
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            digest.update(chunk)
+            chunk = f.read(READ_CHUNK_BYTES)
+    if size == 0:
+        raise UploadError("Empty file")
+    return SpooledUpload(
+        path=path,
+        filename=path.name,
+        mime_type=document_mime_type(head, path.name),
+        size=size,
+        sha256=digest.hexdigest()
+    )
@@ -0,0 +1,166 @@
+"""
+SWMS Response Schemas
+=====================
+Response schemas for structured (schema-constrained) JSON output from Gemini.
+
+Schemas use the OpenAPI subset accepted by GenerateContentConfig.response_schema
+(type, properties, required, items, enum, minimum/maximum) and are also used to validate
+responses locally.
+"""
+
+from typing import Any, Dict, List
+
+from compliance_scoring import SCORE_AREAS
+
+COMPLIANCE_STATUSES = ["Compliant", "Partially Compliant", "Non-Compliant"]
+
+# Compliance areas in the detailed analysis, in the order they are scored
+COMPLIANCE_AREAS = list(SCORE_AREAS)
+
+
+def _string_list() -> Dict[str, Any]:
+    """Schema for a list of strings"""
+    return {"type": "ARRAY", "items": {"type": "STRING"}}
+
+
+AREA_ASSESSMENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "status": {"type": "STRING", "enum": COMPLIANCE_STATUSES},
+        "comments": {"type": "STRING"},
+        "score": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+        "justification": {"type": "STRING"}
+    },
+    "required": ["status", "comments"]
+}
+
+# Compliance report from analyze_swms_compliance and analyze_swms_text
+COMPLIANCE_REPORT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "status": {"type": "STRING"},
+        "project_details": {
+            "type": "OBJECT",
+            "properties": {
+                "project_name": {"type": "STRING"},
+                "principal_contractor": {"type": "STRING"},
+                "subcontractor": {"type": "STRING"},
+                "swms_title": {"type": "STRING"}
+            }
+        },
+        "overall_assessment": {"type": "STRING", "enum": COMPLIANCE_STATUSES},
+        "summary": {"type": "STRING"},
+        "detailed_analysis": {
+            "type": "OBJECT",
+            "properties": {area: AREA_ASSESSMENT_SCHEMA for area in COMPLIANCE_AREAS},
+            "required": COMPLIANCE_AREAS
+        },
+        "urgent_actions": _string_list(),
+        "recommendations": _string_list()
+    },
+    "required": ["overall_assessment", "summary", "detailed_analysis", "urgent_actions", "recommendations"]
+}
+
+# Scored compliance report used by the combined assessment, which serves both
+# analyze_swms_compliance and the get_compliance_score report: every area also
+# requires its 0-100 score and justification
+SCORED_AREA_ASSESSMENT_SCHEMA = dict(
+    AREA_ASSESSMENT_SCHEMA,
+    required=["status", "comments", "score", "justification"]
+)
+SCORED_COMPLIANCE_REPORT_SCHEMA = dict(
+    COMPLIANCE_REPORT_SCHEMA,
+    properties=dict(
+        COMPLIANCE_REPORT_SCHEMA["properties"],
+        detailed_analysis={
+            "type": "OBJECT",
+            "properties": {area: SCORED_AREA_ASSESSMENT_SCHEMA for area in COMPLIANCE_AREAS},
+            "required": COMPLIANCE_AREAS
+        }
+    )
+)
+
+# Result of each quick_check_swms check type
+QUICK_CHECK_SCHEMAS = {
+    "hrcw": {
+        "type": "OBJECT",
+        "properties": {
+            "hrcw_found": _string_list(),
+            "properly_identified": {"type": "BOOLEAN"},
+            "missing": _string_list()
+        },
+        "required": ["hrcw_found", "properly_identified", "missing"]
+    },
+    "ppe": {
+        "type": "OBJECT",
+        "properties": {
+            "ppe_specified": {"type": "BOOLEAN"},
+            "ppe_items": _string_list(),
+            # A list of {task, ppe_items}; response schemas cannot express a map keyed by task name
+            "task_specific_ppe": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {"task": {"type": "STRING"}, "ppe_items": _string_list()},
+                    "required": ["task", "ppe_items"]
+                }
+            },
+            "gaps": _string_list()
+        },
+        "required": ["ppe_specified", "ppe_items", "gaps"]
+    },
+    "emergency": {
+        "type": "OBJECT",
+        "properties": {
+            "emergency_procedures": {"type": "BOOLEAN"},
+            "contact_numbers": {"type": "BOOLEAN"},
+            "evacuation_plan": {"type": "BOOLEAN"},
+            "first_aid": {"type": "BOOLEAN"},
+            "issues": _string_list()
+        },
+        "required": ["emergency_procedures", "contact_numbers", "evacuation_plan", "first_aid", "issues"]
+    },
+    "signatures": {
+        "type": "OBJECT",
+        "properties": {
+            "sign_off_section": {"type": "BOOLEAN"},
+            "consultation_evidence": {"type": "BOOLEAN"},
+            "responsible_person": {"type": "STRING"},
+            "issues": _string_list()
+        },
+        "required": ["sign_off_section", "consultation_evidence", "responsible_person", "issues"]
+    },
+    "hierarchy": {
+        "type": "OBJECT",
+        "properties": {
+            "hierarchy_followed": {"type": "BOOLEAN"},
+            "elimination": _string_list(),
+            "substitution": _string_list(),
+            "engineering": _string_list(),
+            "administrative": _string_list(),
+            "ppe": _string_list(),
+            "issues": _string_list()
+        },
+        "required": ["hierarchy_followed", "issues"]
+    },
+    "hazards": {
+        "type": "OBJECT",
+        "properties": {
+            "hazards_identified": _string_list(),
+            "site_specific": {"type": "BOOLEAN"},
+            "generic_only": {"type": "BOOLEAN"},
+            "missing_common": _string_list(),
+            "count": {"type": "INTEGER"}
+        },
+        "required": ["hazards_identified", "site_specific", "count"]
+    }
+}
+
+
+def quick_check_schema(check_types: List[str]) -> Dict[str, Any]:
+    """Merged schema for a quick check pass: one object per requested check type"""
+    return {
+        "type": "OBJECT",
+        "properties": {check_type: QUICK_CHECK_SCHEMAS[check_type] for check_type in check_types},
+        "required": list(check_types)
+    }
@@ -1,88 +1,529 @@
 """
-R2 Context Module - Manages regulatory documents from Cloudflare R2
+R2 Context Module - Manages regulatory documents from Cloudflare R2 or a local corpus
 """
 
 import os
 import json
 import time
+import mmap
+import asyncio
 import hashlib
-import requests
-from typing import Dict, List, Optional, Tuple, Any
+import mimetypes
+import tempfile
+import httpx
+import re
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from pathlib import Path
 from google import genai
 from google.genai import types
 
+from regulatory_manifest import LOCAL_DOCUMENTS_DIR, ManifestDocument, RegulatoryManifest, load_manifest
+from regulatory_index import INDEX_PATH, RegulatoryIndex, format_clauses
+
 # R2 Configuration
 R2_BUCKET_NAME = "swms-regulations"
 # Public R2 URL for accessing regulatory documents
 R2_PUBLIC_URL = os.getenv("R2_PUBLIC_URL", "https://pub-bb6a39bd73444f4582d3208b2257c357.r2.dev")
+# Parallel document downloads per manager (also the keep-alive pool size)
+R2_MAX_CONCURRENT_FETCHES = int(os.getenv("R2_MAX_CONCURRENT_FETCHES", "6"))
+# Deadline for fetching a single document, in seconds
+R2_FETCH_TIMEOUT_SECONDS = float(os.getenv("R2_FETCH_TIMEOUT_SECONDS", "30"))
+
+# Storage backend for the regulatory corpus: "r2" (HTTP) or "local" (directory)
+CONTEXT_STORAGE_BACKEND = os.getenv("SWMS_CONTEXT_BACKEND", "r2").lower()
+# Corpus directory for the local backend, laid out as <jurisdiction>/<document>
+LOCAL_CORPUS_DIR = Path(os.getenv("SWMS_LOCAL_CORPUS_DIR", str(LOCAL_DOCUMENTS_DIR)))
 
 # Cache configuration
 CACHE_DIR = Path("/tmp/swms-file-cache")
 CACHE_EXPIRY_HOURS = 24
+# How long a document that R2 reported missing is skipped before retrying
+MISSING_CACHE_TTL_HOURS = float(os.getenv("MISSING_CACHE_TTL_HOURS", "6"))
+# Re-upload a cached Gemini file this long before the server expires it
+FILE_EXPIRY_MARGIN_MINUTES = 60
+
+# How regulatory context is attached to prompts: "files" (whole documents)
+# or "retrieval" (top-k clauses from the offline index built by regulatory_index.py)
+CONTEXT_MODE = os.getenv("SWMS_CONTEXT_MODE", "files").lower()
+RETRIEVAL_TOP_K = int(os.getenv("SWMS_RETRIEVAL_TOP_K", "12"))
+# Retrieval query used when the SWMS text itself is not available (e.g. an uploaded PDF)
+DEFAULT_RETRIEVAL_QUERY = (
+    "safe work method statement high risk construction work hazard identification "
+    "risk assessment control measures hierarchy of controls monitoring review "
+    "consultation worker sign-off emergency procedures personal protective equipment"
+)
+
+# Per-request token budget for regulatory context attachments
+CONTEXT_TOKEN_BUDGET = int(os.getenv("SWMS_CONTEXT_TOKEN_BUDGET", "200000"))
+# Model used to count document tokens for the context planner
+TOKEN_COUNT_MODEL = "gemini-2.5-flash"
+# Gemini bills each PDF page as a fixed number of tokens
+TOKENS_PER_PDF_PAGE = 258
+PDF_PAGE_PATTERN = re.compile(rb"/Type\s*/Page(?!s)")
+# Typical bytes per page in the corpus, for PDFs whose pages cannot be counted
+PDF_BYTES_PER_PAGE = 12000
+
+# Server-side cached contents holding a static prompt prefix plus the regulatory bundle
+CONTEXT_CACHING_ENABLED = os.getenv("SWMS_CONTEXT_CACHING", "true").lower() in ("1", "true", "yes")
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("SWMS_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+# Extend a cached content's TTL once it is this close to expiring
+CONTEXT_CACHE_REFRESH_SECONDS = 300
+# After a failed cache creation, send context inline for this long before trying again
+CONTEXT_CACHE_RETRY_SECONDS = 600
+# Reserved request tokens are rounded up to this step for cached contents, so
+# SWMS of similar size share one cached content rather than one each
+CONTEXT_CACHE_RESERVE_STEP_TOKENS = 16000
+
+# Versioned regulatory document manifest
+REGULATORY_MANIFEST = load_manifest()
+
+@dataclass(frozen=True)
+class StoredDocument:
+    """A regulatory document available as a local file, ready for upload"""
+    path: str
+    local_path: Path
+    sha256: str
+    size: int
+    
+    @property
+    def name(self) -> str:
+        """Document file name"""
+        return Path(self.path).name
+    
+    @property
+    def mime_type(self) -> str:
+        """MIME type guessed from the file name"""
+        return mimetypes.guess_type(self.name)[0] or "application/pdf"
+
+
+def hash_file_mmap(file_path: Path) -> str:
+    """SHA-256 of a file read through a memory map, without copying it into Python bytes"""
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256(b"").hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+
+class StorageBackend:
+    """Where R2ContextManager reads regulatory documents from"""
+    name = "base"
+    
+    async def fetch(self, doc_path: str) -> Optional[StoredDocument]:
+        """Return the document as a local file, or None if unavailable"""
+        raise NotImplementedError
+    
+    async def fetch_many(self, doc_paths: List[str]) -> Dict[str, Optional[StoredDocument]]:
+        """Fetch several documents in parallel"""
+        results = await asyncio.gather(*(self.fetch(doc_path) for doc_path in doc_paths))
+        return dict(zip(doc_paths, results))
+    
+    async def check(self, doc: ManifestDocument) -> str:
+        """Check a manifest entry: "ok", "missing", "size_mismatch" or "error: ..." """
+        raise NotImplementedError
+    
+    async def close(self):
+        """Release any held resources"""
+
+
+class LocalDirectoryBackend(StorageBackend):
+    """Reads the corpus straight from a local directory (no network, no copies)"""
+    name = "local"
+    
+    def __init__(self, base_dir: Path = LOCAL_CORPUS_DIR):
+        self.base_dir = Path(base_dir)
+        # (path, size, mtime) -> sha256, so unchanged files are hashed once
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+    
+    async def fetch(self, doc_path: str) -> Optional[StoredDocument]:
+        local_path = self.base_dir / doc_path
+        try:
+            stat = local_path.stat()
+        except FileNotFoundError:
+            return None
+        
+        hash_key = (doc_path, stat.st_size, stat.st_mtime_ns)
+        sha256 = self._hashes.get(hash_key)
+        if sha256 is None:
+            sha256 = await asyncio.to_thread(hash_file_mmap, local_path)
+            self._hashes[hash_key] = sha256
+        
+        return StoredDocument(path=doc_path, local_path=local_path, sha256=sha256, size=stat.st_size)
+    
+    async def check(self, doc: ManifestDocument) -> str:
+        local_path = self.base_dir / doc.path
+        if not local_path.is_file():
+            return "missing"
+        if doc.size is not None and local_path.stat().st_size != doc.size:
+            return "size_mismatch"
+        return "ok"
+
+
+class R2HttpBackend(StorageBackend):
+    """
+    Reads the corpus from the public R2 bucket over a pooled async HTTP client.
+    
+    Downloads are kept in an on-disk conditional-GET cache, and documents R2
+    reports missing are remembered in a negative cache. Both live in the
+    manager's file_cache under "documents" and "missing".
+    """
+    name = "r2"
+    
+    def __init__(
+        self,
+        cache: Dict,
+        save_cache: Callable[[], None],
+        documents_dir: Path,
+        http_client: Optional[httpx.AsyncClient] = None
+    ):
+        self.cache = cache
+        self.save_cache = save_cache
+        self.documents_dir = documents_dir
+        self.documents_dir.mkdir(exist_ok=True)
+        self._http_client = http_client
+        self._fetch_semaphore = asyncio.Semaphore(R2_MAX_CONCURRENT_FETCHES)
+    
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Return the shared keep-alive HTTP client, creating it on first use"""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=R2_MAX_CONCURRENT_FETCHES,
+                    max_keepalive_connections=R2_MAX_CONCURRENT_FETCHES
+                ),
+                timeout=httpx.Timeout(R2_FETCH_TIMEOUT_SECONDS),
+                follow_redirects=True
+            )
+        return self._http_client
+    
+    async def close(self):
+        """Close the shared HTTP client"""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+    
+    def _get_cache_key(self, doc_path: str) -> str:
+        """Generate cache key for document"""
+        return hashlib.md5(doc_path.encode()).hexdigest()
+    
+    def _get_document_path(self, doc_path: str) -> Path:
+        """Local path of the cached bytes for an R2 document"""
+        return self.documents_dir / f"{self._get_cache_key(doc_path)}{Path(doc_path).suffix}"
+    
+    def _is_cache_valid(self, cache_entry: Dict) -> bool:
+        """Check if cache entry is still valid"""
+        if not cache_entry:
+            return False
+        
+        cache_time = cache_entry.get("timestamp", 0)
+        current_time = time.time()
+        hours_elapsed = (current_time - cache_time) / 3600
+        
+        return hours_elapsed < CACHE_EXPIRY_HOURS
+    
+    def _is_known_missing(self, doc_path: str) -> bool:
+        """Check if R2 reported the document missing within MISSING_CACHE_TTL_HOURS"""
+        missing_entry = self.cache["missing"].get(doc_path)
+        if not missing_entry:
+            return False
+        hours_elapsed = (time.time() - missing_entry.get("timestamp", 0)) / 3600
+        return hours_elapsed < MISSING_CACHE_TTL_HOURS
+    
+    def _mark_missing(self, doc_path: str, status_code: int):
+        """Record a missing document in the negative cache"""
+        self.cache["missing"][doc_path] = {
+            "status_code": status_code,
+            "timestamp": time.time()
+        }
+        self.save_cache()
+    
+    def _stored(self, doc_path: str, cache_entry: Dict) -> StoredDocument:
+        """Describe a document held in the on-disk cache"""
+        return StoredDocument(
+            path=doc_path,
+            local_path=self._get_document_path(doc_path),
+            sha256=cache_entry["sha256"],
+            size=cache_entry["size"]
+        )
+    
+    async def fetch(self, doc_path: str) -> Optional[StoredDocument]:
+        """
+        Fetch document from R2 bucket, serving from the on-disk cache when possible.
+        
+        Cached bytes are used without a request until CACHE_EXPIRY_HOURS, then
+        revalidated with If-None-Match/If-Modified-Since and reused on a 304.
+        """
+        url = f"{R2_PUBLIC_URL}/{doc_path}"
+        cache_key = self._get_cache_key(doc_path)
+        cache_entry = self.cache["documents"].get(cache_key)
+        local_path = self._get_document_path(doc_path)
+        if not local_path.exists():
+            cache_entry = None
+        
+        if cache_entry and self._is_cache_valid(cache_entry):
+            return self._stored(doc_path, cache_entry)
+        
+        # Known-missing documents cost no network time until the negative entry expires
+        if not cache_entry and self._is_known_missing(doc_path):
+            return None
+        
+        headers = {}
+        if cache_entry:
+            if cache_entry.get("etag"):
+                headers["If-None-Match"] = cache_entry["etag"]
+            if cache_entry.get("last_modified"):
+                headers["If-Modified-Since"] = cache_entry["last_modified"]
+        
+        async with self._fetch_semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self._download(doc_path, url, headers, cache_key, cache_entry),
+                    timeout=R2_FETCH_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                print(f"Timed out fetching {doc_path} after {R2_FETCH_TIMEOUT_SECONDS}s")
+            except Exception as e:
+                print(f"Error fetching {doc_path}: {e}")
+        
+        # Serve a stale copy rather than nothing when R2 cannot be reached
+        if cache_entry:
+            return self._stored(doc_path, cache_entry)
+        return None
+    
+    async def _download(
+        self,
+        doc_path: str,
+        url: str,
+        headers: Dict[str, str],
+        cache_key: str,
+        cache_entry: Optional[Dict]
+    ) -> Optional[StoredDocument]:
+        """Stream a document into the on-disk cache, hashing it on the way"""
+        local_path = self._get_document_path(doc_path)
+        async with self._get_http_client().stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and cache_entry:
+                cache_entry["timestamp"] = time.time()
+                self.save_cache()
+                return self._stored(doc_path, cache_entry)
+            elif response.status_code == 200:
+                self.cache["missing"].pop(doc_path, None)
+                # Unique temp name: two bundles may download the same national document at once
+                fd, temp_path = tempfile.mkstemp(dir=self.documents_dir, suffix=".part")
+                digest = hashlib.sha256()
+                size = 0
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        async for chunk in response.aiter_bytes():
+                            f.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                    os.replace(temp_path, local_path)
+                except BaseException:
+                    # Includes the cancellation from a fetch timeout; never leave a .part behind
+                    try:
+                        os.unlink(temp_path)
+                    except FileNotFoundError:
+                        pass
+                    raise
+                
+                cache_entry = {
+                    "path": doc_path,
+                    "etag": response.headers.get("etag"),
+                    "last_modified": response.headers.get("last-modified"),
+                    "sha256": digest.hexdigest(),
+                    "size": size,
+                    "timestamp": time.time()
+                }
+                self.cache["documents"][cache_key] = cache_entry
+                self.save_cache()
+                return self._stored(doc_path, cache_entry)
+            elif response.status_code in (404, 410):
+                print(f"Regulatory document missing from R2: {doc_path}")
+                self._mark_missing(doc_path, response.status_code)
+                return None
+            else:
+                print(f"Failed to fetch {doc_path}: HTTP {response.status_code}")
+                return None
+    
+    async def check(self, doc: ManifestDocument) -> str:
+        async with self._fetch_semaphore:
+            try:
+                response = await asyncio.wait_for(
+                    self._get_http_client().head(f"{R2_PUBLIC_URL}/{doc.path}"),
+                    timeout=R2_FETCH_TIMEOUT_SECONDS
+                )
+            except Exception as e:
+                return f"error: {e}"
+        if response.status_code in (404, 410):
+            self._mark_missing(doc.path, response.status_code)
+            return "missing"
+        if response.status_code != 200:
+            return f"error: HTTP {response.status_code}"
+        self.cache["missing"].pop(doc.path, None)
+        content_length = response.headers.get("content-length")
+        if doc.size is not None and content_length and int(content_length) != doc.size:
+            return "size_mismatch"
+        return "ok"
+
+
+def estimate_file_tokens(size_bytes: int, mime_type: str = "application/pdf") -> int:
+    """Rough prompt-token cost of a file from its size alone"""
+    if mime_type == "application/pdf":
+        return max(1, size_bytes // PDF_BYTES_PER_PAGE) * TOKENS_PER_PDF_PAGE
+    return size_bytes // 4
+
+
+def estimate_document_tokens(stored: StoredDocument) -> int:
+    """Rough prompt-token cost of a document: Gemini bills PDFs per page, others by size"""
+    if stored.mime_type == "application/pdf" and stored.size:
+        with open(stored.local_path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                pages = len(PDF_PAGE_PATTERN.findall(mapped))
+        if pages:
+            return pages * TOKENS_PER_PDF_PAGE
+    # Page objects inside compressed object streams cannot be counted this way
+    return estimate_file_tokens(stored.size, stored.mime_type)
+
+
+@dataclass
+class ContextPlan:
+    """Regulatory context chosen for one request, with what was left out"""
+    items: List[Any] = field(default_factory=list)
+    included: List[Dict[str, Any]] = field(default_factory=list)
+    dropped: List[Dict[str, Any]] = field(default_factory=list)
+    mode: str = "files"
+    budget: int = 0
+    estimated_tokens: int = 0
+    # Content hashes of the included documents (or of the clause text in retrieval mode)
+    content_hashes: List[str] = field(default_factory=list)
+    
+    def summary(self) -> Dict[str, Any]:
+        """Report for tool responses"""
+        return {
+            "mode": self.mode,
+            "token_budget": self.budget,
+            "estimated_tokens": self.estimated_tokens,
+            "included": self.included,
+            "dropped": self.dropped
+        }
+    
+    def fingerprint(self) -> str:
+        """Short hash identifying this exact context: mode, budget and included content"""
+        canonical = f"{self.mode}:{self.budget}:{','.join(sorted(self.content_hashes))}"
+        return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class CachedContext:
+    """Server-side cached content holding a prompt prefix and regulatory context"""
+    name: str
+    key: str
+    expire_time: Optional[datetime] = None
+    context: Dict[str, Any] = field(default_factory=dict)
+
+
+def context_parts(items: List[Any]) -> List[types.Part]:
+    """Prompt parts for context plan items (retrieved clause text or Gemini files)"""
+    parts = []
+    for item in items:
+        if isinstance(item, str):
+            parts.append(types.Part.from_text(text=item))
+        else:
+            # Cached handles already carry uri and mime type, so no files.get round-trip
+            parts.append(types.Part.from_uri(file_uri=item.uri, mime_type=item.mime_type))
+    return parts
 
-# Document mapping by jurisdiction
-REGULATORY_DOCUMENTS = {
-    "national": [
-        "safe-work-australia-swms-info-sheet.pdf",
-        "model-code-practice-construction.pdf",
-        "high-risk-construction-work-list.pdf"
-    ],
-    "nsw": [
-        "nsw-whs-regulation-2017.pdf",
-        "safework-nsw-swms-template.pdf",
-        "nsw-construction-cop.pdf"
-    ],
-    "vic": [
-        "vic-ohs-regulations-2017.pdf",
-        "worksafe-vic-construction-cop.pdf"
-    ],
-    "qld": [
-        "qld-whs-regulation-2011.pdf",
-        "worksafe-qld-swms-guide.pdf"
-    ],
-    "wa": [
-        "wa-whs-regulations-2022.pdf",
-        "worksafe-wa-construction-cop.pdf"
-    ],
-    "sa": [
-        "sa-whs-regulations-2012.pdf",
-        "safework-sa-swms-template.pdf"
-    ],
-    "tas": [
-        "tas-whs-regulations-2012.pdf",
-        "worksafe-tas-swms-guide.pdf"
-    ],
-    "act": [
-        "act-whs-regulation-2011.pdf",
-        "worksafe-act-swms-guide.pdf"
-    ],
-    "nt": [
-        "nt-whs-regulations-2011.pdf",
-        "nt-worksafe-construction-cop.pdf"
-    ]
-}
 
 class R2ContextManager:
-    """Manages regulatory document context from R2 storage"""
+    """Manages regulatory document context from R2 (or local) storage"""
     
-    def __init__(self, client: genai.Client):
-        """Initialize with Gemini client"""
+    def __init__(
+        self,
+        client: genai.Client,
+        http_client: Optional[httpx.AsyncClient] = None,
+        manifest: Optional[RegulatoryManifest] = None,
+        backend: Optional[StorageBackend] = None
+    ):
+        """
+        Initialize with Gemini client.
+        
+        The storage backend defaults to SWMS_CONTEXT_BACKEND; http_client is
+        shared with the R2 backend when given.
+        """
         self.client = client
+        self.manifest = manifest or REGULATORY_MANIFEST
+        self.context_mode = CONTEXT_MODE
+        self._index: Optional[RegulatoryIndex] = None
+        self._index_unavailable = False
+        # In-flight context loads by jurisdiction, shared by concurrent callers
+        self._inflight_loads: Dict[str, asyncio.Task] = {}
+        # Context bundles kept hot in memory for warmed-up jurisdictions
+        self._pinned_bundles: Dict[str, List[Any]] = {}
+        self._warmup_task: Optional[asyncio.Task] = None
+        self.warmup_status = {
+            "enabled": False,
+            "jurisdictions": [],
+            "completed": [],
+            "failed": {},
+            "started_at": None,
+            "finished_at": None
+        }
         self.cache_dir = CACHE_DIR
         self.cache_dir.mkdir(exist_ok=True)
         self.file_cache = self._load_cache()
+        # Content hashes whose Gemini handle has been confirmed by files.get in this process
+        self._verified_files = set()
+        # One upload at a time per content hash
+        self._upload_locks: Dict[str, asyncio.Lock] = {}
+        # Cached-content keys confirmed by caches.get in this process, and
+        # one create/refresh at a time per key
+        self._verified_caches = set()
+        self._cache_locks: Dict[str, asyncio.Lock] = {}
+        # Keys whose cache creation failed, with the time of the failure
+        self._caching_failures: Dict[str, float] = {}
+        self.backend = backend or self._create_backend(http_client)
+    
+    def _create_backend(self, http_client: Optional[httpx.AsyncClient]) -> StorageBackend:
+        """Create the storage backend selected by SWMS_CONTEXT_BACKEND"""
+        if CONTEXT_STORAGE_BACKEND == "local":
+            return LocalDirectoryBackend(LOCAL_CORPUS_DIR)
+        if CONTEXT_STORAGE_BACKEND != "r2":
+            print(f"Warning: Unknown SWMS_CONTEXT_BACKEND '{CONTEXT_STORAGE_BACKEND}', using r2")
+        return R2HttpBackend(
+            self.file_cache,
+            self._save_cache,
+            self.cache_dir / "documents",
+            http_client
+        )
+    
+    async def close(self):
+        """Release the storage backend's resources"""
+        await self.backend.close()
     
     def _load_cache(self) -> Dict:
         """Load file cache from disk"""
         cache_file = self.cache_dir / "file_cache.json"
+        cache = {}
         if cache_file.exists():
             try:
                 with open(cache_file, 'r') as f:
-                    return json.load(f)
+                    cache = json.load(f)
             except:
-                return {}
-        return {}
+                cache = {}
+        cache.setdefault("files", {})
+        cache.setdefault("documents", {})
+        cache.setdefault("missing", {})
+        cache.setdefault("token_counts", {})
+        cache.setdefault("cached_contents", {})
+        
+        # Cached bytes belong to a corpus version; Gemini handles are content-keyed and survive
+        if cache.get("corpus_version") != self.manifest.version:
+            cache["documents"] = {}
+            cache["missing"] = {}
+            cache["cached_contents"] = {}
+            cache["corpus_version"] = self.manifest.version
+        return cache
     
     def _save_cache(self):
         """Save file cache to disk"""
@@ -90,85 +531,570 @@ class R2ContextManager:
         with open(cache_file, 'w') as f:
             json.dump(self.file_cache, f)
     
-    def _get_cache_key(self, doc_path: str) -> str:
-        """Generate cache key for document"""
-        return hashlib.md5(doc_path.encode()).hexdigest()
+    def _is_handle_fresh(self, file_entry: Dict) -> bool:
+        """Check if a cached Gemini file handle is not close to its server-side expiry"""
+        expiration = file_entry.get("expiration_time")
+        if not expiration:
+            return False
+        try:
+            expires_at = datetime.fromisoformat(expiration)
+        except ValueError:
+            return False
+        return self._expires_after_margin(expires_at)
     
-    def _is_cache_valid(self, cache_entry: Dict) -> bool:
-        """Check if cache entry is still valid"""
-        if not cache_entry:
+    def _expires_after_margin(self, expires_at: Optional[datetime]) -> bool:
+        """Check if an expiry time is further away than FILE_EXPIRY_MARGIN_MINUTES"""
+        if not expires_at:
             return False
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        margin = timedelta(minutes=FILE_EXPIRY_MARGIN_MINUTES)
+        return expires_at - datetime.now(timezone.utc) > margin
+    
+    def _file_entry(self, file_obj: Any) -> Dict:
+        """Build a cache entry from a Gemini file object"""
+        expiration = getattr(file_obj, "expiration_time", None)
+        return {
+            "name": file_obj.name,
+            "uri": file_obj.uri,
+            "mime_type": file_obj.mime_type,
+            "display_name": getattr(file_obj, "display_name", None),
+            "expiration_time": expiration.isoformat() if expiration else None,
+            "timestamp": time.time()
+        }
+    
+    def _file_from_entry(self, file_entry: Dict) -> types.File:
+        """Rebuild a Gemini file object from a cache entry"""
+        expiration = file_entry.get("expiration_time")
+        return types.File(
+            name=file_entry["name"],
+            uri=file_entry["uri"],
+            mime_type=file_entry["mime_type"],
+            display_name=file_entry.get("display_name"),
+            expiration_time=datetime.fromisoformat(expiration) if expiration else None
+        )
+    
+    async def get_cached_file(self, content_hash: str) -> Optional[types.File]:
+        """
+        Return the cached Gemini file for a content hash, or None if it must be re-uploaded.
         
-        cache_time = cache_entry.get("timestamp", 0)
-        current_time = time.time()
-        hours_elapsed = (current_time - cache_time) / 3600
+        A handle is confirmed with files.get the first time it is used in this
+        process, so entries loaded from disk are dropped if Gemini has deleted them.
+        """
+        file_entry = self.file_cache["files"].get(content_hash)
+        if not file_entry or not self._is_handle_fresh(file_entry):
+            return None
         
-        return hours_elapsed < CACHE_EXPIRY_HOURS
+        if content_hash not in self._verified_files:
+            try:
+                remote_file = await self.client.aio.files.get(name=file_entry["name"])
+            except Exception as e:
+                print(f"Cached file {file_entry['name']} is no longer available: {e}")
+                remote_file = None
+            
+            state = getattr(remote_file, "state", None)
+            if remote_file is None or (state is not None and str(state).endswith("FAILED")):
+                del self.file_cache["files"][content_hash]
+                self._save_cache()
+                return None
+            
+            self.file_cache["files"][content_hash] = self._file_entry(remote_file)
+            self._save_cache()
+            self._verified_files.add(content_hash)
+            file_entry = self.file_cache["files"][content_hash]
+            if not self._is_handle_fresh(file_entry):
+                return None
+        
+        return self._file_from_entry(file_entry)
     
-    def fetch_from_r2(self, doc_path: str) -> Optional[bytes]:
-        """Fetch document from R2 bucket"""
-        url = f"{R2_PUBLIC_URL}/{doc_path}"
+    async def get_or_upload_file(self, document: StoredDocument) -> Optional[types.File]:
+        """
+        Return a live Gemini file for the document, uploading only on a cache miss.
         
-        try:
-            response = requests.get(url, timeout=30)
-            if response.status_code == 200:
-                return response.content
-            else:
-                print(f"Failed to fetch {doc_path}: HTTP {response.status_code}")
+        Uploads are serialized per content hash, so identical documents requested
+        by concurrent bundles are uploaded once and shared.
+        """
+        content_hash = document.sha256
+        upload_lock = self._upload_locks.setdefault(content_hash, asyncio.Lock())
+        async with upload_lock:
+            cached_file = await self.get_cached_file(content_hash)
+            if cached_file:
+                return cached_file
+            
+            file_obj = await self.upload_to_gemini(document)
+            if not file_obj:
                 return None
-        except Exception as e:
-            print(f"Error fetching {doc_path}: {e}")
-            return None
+            
+            self.file_cache["files"][content_hash] = self._file_entry(file_obj)
+            self._verified_files.add(content_hash)
+            self._save_cache()
+            return file_obj
     
-    def upload_to_gemini(self, doc_bytes: bytes, doc_name: str) -> Optional[Dict]:
-        """Upload document to Gemini Files API and return file object"""
+    async def upload_to_gemini(self, document: StoredDocument) -> Optional[types.File]:
+        """Upload document to Gemini Files API straight from its local file"""
         try:
-            # Save to temp file for upload
-            temp_path = self.cache_dir / f"temp_{doc_name}"
-            with open(temp_path, 'wb') as f:
-                f.write(doc_bytes)
-            
-            # Upload to Gemini
-            uploaded_file = self.client.files.upload(file=str(temp_path))
-            
-            # Clean up temp file
-            temp_path.unlink(missing_ok=True)
-            
-            # Return the full file object
-            return uploaded_file
+            return await self.client.aio.files.upload(
+                file=str(document.local_path),
+                config=types.UploadFileConfig(
+                    display_name=document.name,
+                    mime_type=document.mime_type
+                )
+            )
         except Exception as e:
-            print(f"Error uploading {doc_name} to Gemini: {e}")
+            print(f"Error uploading {document.name} to Gemini: {e}")
             return None
     
-    def get_context_files(self, jurisdiction: str = "nsw") -> List[Any]:
+    async def get_context_files(self, jurisdiction: str = "nsw") -> List[Any]:
         """Get list of Gemini file objects for jurisdiction context"""
-        file_objects = []
+        return [file_obj for _, file_obj in await self.get_context_bundle(jurisdiction)]
+    
+    async def get_context_bundle(self, jurisdiction: str = "nsw") -> List[Tuple[StoredDocument, Any]]:
+        """
+        Get (document, Gemini file) pairs for jurisdiction context.
         
-        # Always include national documents
-        docs_to_fetch = REGULATORY_DOCUMENTS.get("national", [])
+        Concurrent callers for the same jurisdiction share a single in-flight
+        load; if it fails, every waiter receives the same exception.
+        """
+        jurisdiction = jurisdiction.lower()
+        pinned = self._pinned_bundles.get(jurisdiction)
+        if pinned and all(
+            self._expires_after_margin(getattr(file_obj, "expiration_time", None))
+            for _, file_obj in pinned
+        ):
+            return list(pinned)
         
-        # Add jurisdiction-specific documents
-        if jurisdiction.lower() != "national":
-            docs_to_fetch.extend(REGULATORY_DOCUMENTS.get(jurisdiction.lower(), []))
+        load_task = self._inflight_loads.get(jurisdiction)
+        if load_task is None:
+            load_task = asyncio.ensure_future(self._load_context_bundle(jurisdiction))
+            self._inflight_loads[jurisdiction] = load_task
+            load_task.add_done_callback(
+                lambda task: self._finish_load(jurisdiction, task)
+            )
         
-        for doc_name in docs_to_fetch:
-            doc_path = f"{jurisdiction.lower()}/{doc_name}" if jurisdiction.lower() != "national" else f"national/{doc_name}"
-            cache_key = self._get_cache_key(doc_path)
-            
-            # Check cache - for now, skip cache to always get fresh file objects
-            # TODO: Cache file objects properly
-            
-            # Fetch from R2
-            doc_bytes = self.fetch_from_r2(doc_path)
-            if not doc_bytes:
+        # Shield the shared load so one cancelled caller does not cancel the others
+        bundle = await asyncio.shield(load_task)
+        return list(bundle)
+    
+    def _finish_load(self, jurisdiction: str, load_task: asyncio.Task):
+        """Forget a completed in-flight load so the next call starts a fresh one"""
+        if self._inflight_loads.get(jurisdiction) is load_task:
+            del self._inflight_loads[jurisdiction]
+        if load_task.cancelled():
+            return
+        # Retrieving the exception also stops asyncio warning when every waiter was cancelled
+        if load_task.exception() is None and jurisdiction in self._pinned_bundles:
+            self._pinned_bundles[jurisdiction] = load_task.result()
+    
+    def start_warmup(self, jurisdictions: List[str]) -> Optional[asyncio.Task]:
+        """
+        Start loading and pinning context for the given jurisdictions in the background.
+        
+        Safe to call repeatedly; only the first call starts a warm-up task.
+        """
+        if self._warmup_task is not None or not jurisdictions:
+            return self._warmup_task
+        
+        jurisdictions = [j.lower() for j in jurisdictions]
+        self.warmup_status.update({
+            "enabled": True,
+            "jurisdictions": jurisdictions,
+            "started_at": time.time()
+        })
+        self._warmup_task = asyncio.ensure_future(self._warmup(jurisdictions))
+        return self._warmup_task
+    
+    async def _warmup(self, jurisdictions: List[str]):
+        """Load each jurisdiction's bundle and pin the resulting handles"""
+        async def warm(jurisdiction: str):
+            try:
+                self._pinned_bundles[jurisdiction] = await self.get_context_bundle(jurisdiction)
+                self.warmup_status["completed"].append(jurisdiction)
+            except Exception as e:
+                print(f"Warning: Context warm-up failed for {jurisdiction}: {e}")
+                self.warmup_status["failed"][jurisdiction] = str(e)
+        
+        await asyncio.gather(*(warm(jurisdiction) for jurisdiction in jurisdictions))
+        self.warmup_status["finished_at"] = time.time()
+    
+    def get_warmup_status(self) -> Dict[str, Any]:
+        """Report warm-up progress for health checks"""
+        status = dict(self.warmup_status)
+        done = set(status["completed"]) | set(status["failed"])
+        status["pending"] = [j for j in status["jurisdictions"] if j not in done]
+        status["ready"] = not status["enabled"] or status["finished_at"] is not None
+        return status
+    
+    async def _load_context_bundle(self, jurisdiction: str) -> List[Tuple[StoredDocument, Any]]:
+        """Fetch and upload the regulatory bundle for a jurisdiction"""
+        # National documents plus the jurisdiction's own, each under its own folder.
+        # Entries the manifest already knows are identical are fetched once.
+        documents = {}
+        manifest_hashes = set()
+        for doc in self.manifest.documents_for(jurisdiction):
+            if doc.sha256 and doc.sha256 in manifest_hashes:
+                continue
+            if doc.sha256:
+                manifest_hashes.add(doc.sha256)
+            documents[doc.path] = doc
+        
+        # Fetch the whole bundle from storage in parallel
+        fetched = await self.backend.fetch_many(list(documents))
+        
+        # Collapse byte-identical documents so each unique blob is uploaded and attached once
+        unique_documents = {}
+        for doc_path, stored in fetched.items():
+            if not stored:
                 continue
+            expected_hash = documents[doc_path].sha256
+            if expected_hash and stored.sha256 != expected_hash:
+                print(f"Warning: {doc_path} does not match manifest version {self.manifest.version}")
+            unique_documents.setdefault(stored.sha256, stored)
+        
+        # Reuse the Gemini file for identical content, uploading only on a miss
+        stored_documents = list(unique_documents.values())
+        file_objects = await asyncio.gather(*(
+            self.get_or_upload_file(stored)
+            for stored in stored_documents
+        ))
+        
+        return [
+            (stored, file_obj)
+            for stored, file_obj in zip(stored_documents, file_objects)
+            if file_obj
+        ]
+    
+    async def _get_index(self) -> Optional[RegulatoryIndex]:
+        """
+        Load the retrieval index on first use.
+        
+        None if it has not been built or was built from another corpus version,
+        in which case context falls back to whole files.
+        """
+        if self._index is None and not self._index_unavailable:
+            try:
+                self._index = await asyncio.to_thread(RegulatoryIndex.load, INDEX_PATH, self.manifest.version)
+            except Exception as e:
+                print(f"Warning: Regulatory index unavailable at {INDEX_PATH}: {e}")
+                self._index_unavailable = True
+        return self._index
+    
+    async def get_context_clauses(
+        self,
+        jurisdiction: str = "nsw",
+        query: Optional[str] = None,
+        top_k: int = RETRIEVAL_TOP_K
+    ) -> Optional[str]:
+        """
+        Get the most relevant national and jurisdiction clauses as prompt text.
+        
+        Args:
+            jurisdiction: State/territory code (nsw, vic, qld, etc.)
+            query: SWMS text or job description to match against; defaults to
+                   the general SWMS assessment topics
+            top_k: Number of clauses to include
+            
+        Returns:
+            Formatted clause text, or None if the index is unavailable or nothing matched
+        """
+        index = await self._get_index()
+        if not index:
+            return None
+        results = await asyncio.to_thread(
+            index.search,
+            query or DEFAULT_RETRIEVAL_QUERY,
+            {"national", jurisdiction.lower()},
+            top_k
+        )
+        return format_clauses(results) if results else None
+    
+    async def estimate_tokens(self, stored: StoredDocument, file_obj: Any = None) -> int:
+        """
+        Estimate the prompt tokens a document costs, cached per content hash.
+        
+        Uses the Gemini count_tokens API when a file handle is available and
+        falls back to a page-count heuristic.
+        """
+        cached = self.file_cache["token_counts"].get(stored.sha256)
+        if cached is not None:
+            return cached
+        
+        tokens = None
+        if file_obj is not None:
+            try:
+                response = await self.client.aio.models.count_tokens(
+                    model=TOKEN_COUNT_MODEL,
+                    contents=[file_obj]
+                )
+                tokens = response.total_tokens
+            except Exception as e:
+                print(f"Warning: Could not count tokens for {stored.path}: {e}")
+        
+        if tokens is None:
+            tokens = await asyncio.to_thread(estimate_document_tokens, stored)
+        
+        self.file_cache["token_counts"][stored.sha256] = tokens
+        self._save_cache()
+        return tokens
+    
+    async def _rank_documents(
+        self,
+        jurisdiction: str,
+        documents: List[StoredDocument],
+        query: Optional[str]
+    ) -> List[float]:
+        """
+        Relevance of each document to the query.
+        
+        With a retrieval index, this is the summed BM25 score of the document's
+        matching clauses. Otherwise the jurisdiction's own documents rank above
+        national ones, in manifest order.
+        """
+        index = await self._get_index() if query else None
+        if index:
+            results = await asyncio.to_thread(
+                index.search, query, {"national", jurisdiction.lower()}, RETRIEVAL_TOP_K * 10
+            )
+            scores: Dict[str, float] = {}
+            for result in results:
+                scores[result["path"]] = scores.get(result["path"], 0.0) + result["score"]
+            if scores:
+                return [scores.get(stored.path, 0.0) for stored in documents]
+        
+        count = len(documents)
+        return [
+            (count - position) + (count if not stored.path.startswith("national/") else 0)
+            for position, stored in enumerate(documents)
+        ]
+    
+    async def plan_context(
+        self,
+        jurisdiction: str = "nsw",
+        query: Optional[str] = None,
+        token_budget: Optional[int] = None,
+        reserved_tokens: int = 0
+    ) -> ContextPlan:
+        """
+        Choose which regulatory documents fit the per-request token budget.
+        
+        Documents are packed greedily from most to least relevant; any that
+        would exceed the budget are reported as dropped.
+        
+        Args:
+            jurisdiction: State/territory code (nsw, vic, qld, etc.)
+            query: Text to rank documents against (SWMS text, job description)
+            token_budget: Tokens available for regulatory context (default CONTEXT_TOKEN_BUDGET)
+            reserved_tokens: Tokens already committed to the rest of the request, e.g. the SWMS
+        """
+        budget = (token_budget or CONTEXT_TOKEN_BUDGET) - reserved_tokens
+        bundle = await self.get_context_bundle(jurisdiction)
+        documents = [stored for stored, _ in bundle]
+        
+        tokens = await asyncio.gather(*(self.estimate_tokens(stored, file_obj) for stored, file_obj in bundle))
+        relevance = await self._rank_documents(jurisdiction, documents, query)
+        
+        plan = ContextPlan(budget=budget)
+        for i in sorted(range(len(bundle)), key=lambda i: relevance[i], reverse=True):
+            entry = {"path": documents[i].path, "tokens": tokens[i], "relevance": round(relevance[i], 3)}
+            if plan.estimated_tokens + tokens[i] <= budget:
+                plan.items.append(bundle[i][1])
+                plan.included.append(entry)
+                plan.content_hashes.append(documents[i].sha256)
+                plan.estimated_tokens += tokens[i]
+            else:
+                plan.dropped.append(entry)
+        return plan
+    
+    async def get_prompt_context(
+        self,
+        jurisdiction: str = "nsw",
+        query: Optional[str] = None,
+        reserved_tokens: int = 0
+    ) -> ContextPlan:
+        """
+        Get regulatory context for a prompt.
+        
+        In retrieval mode this is a single text block of relevant clauses; otherwise
+        (or if retrieval is unavailable) it is the jurisdiction's Gemini file objects
+        that fit the token budget. Use plan.items as prompt contents.
+        """
+        if self.context_mode == "retrieval":
+            clauses = await self.get_context_clauses(jurisdiction, query)
+            if clauses:
+                return ContextPlan(
+                    items=[clauses],
+                    mode="retrieval",
+                    budget=CONTEXT_TOKEN_BUDGET - reserved_tokens,
+                    estimated_tokens=len(clauses) // 4,
+                    content_hashes=[hashlib.sha256(clauses.encode()).hexdigest()]
+                )
+        return await self.plan_context(jurisdiction, query, reserved_tokens=reserved_tokens)
+    
+    def _cached_content_key(
+        self,
+        jurisdiction: str,
+        prompt: str,
+        model: str,
+        plan: ContextPlan,
+        reserved_tokens: int = 0
+    ) -> str:
+        """
+        Cache key: model, jurisdiction, corpus version, prompt version (a hash of its
+        text), reserved tokens and the context plan (mode, token budget and included
+        documents), so a change to SWMS_CONTEXT_MODE or SWMS_CONTEXT_TOKEN_BUDGET gets
+        new cached content
+        """
+        prompt_version = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+        return (
+            f"{model}:{jurisdiction.lower()}:{self.manifest.version}:{prompt_version}:"
+            f"{reserved_tokens}:{plan.mode}:{plan.budget}:{plan.fingerprint()}"
+        )
+    
+    async def get_cached_context(
+        self,
+        jurisdiction: str,
+        prompt: str = "",
+        model: str = "gemini-2.5-flash",
+        reserved_tokens: int = 0
+    ) -> Optional[CachedContext]:
+        """
+        Return server-side cached content holding the prompt and regulatory context.
+        
+        One cached content is kept per (model, jurisdiction, corpus version, prompt
+        version, context plan); it is created on first use and its TTL is extended as it nears
+        expiry. Returns None when caching is disabled or fails, in which case the
+        caller should send the prompt and get_prompt_context() items inline.
+        
+        Args:
+            jurisdiction: State/territory code (nsw, vic, qld, etc.)
+            prompt: Static prompt prefix to cache ahead of the regulatory context
+            model: Model the cached content is created for (must match the request)
+            reserved_tokens: Tokens committed to the rest of the request (the SWMS); rounded
+                up to CONTEXT_CACHE_RESERVE_STEP_TOKENS
+        """
+        if not CONTEXT_CACHING_ENABLED:
+            return None
+        
+        step = CONTEXT_CACHE_RESERVE_STEP_TOKENS
+        reserved_tokens = -(-reserved_tokens // step) * step
+        # The plan reuses the pinned bundle and cached token counts, so this is cheap after the first call
+        plan = await self.get_prompt_context(jurisdiction, reserved_tokens=reserved_tokens)
+        if not plan.items:
+            return None
+        
+        key = self._cached_content_key(jurisdiction, prompt, model, plan, reserved_tokens)
+        failed_at = self._caching_failures.get(key)
+        if failed_at and time.time() - failed_at < CONTEXT_CACHE_RETRY_SECONDS:
+            return None
+        
+        cache_lock = self._cache_locks.setdefault(key, asyncio.Lock())
+        async with cache_lock:
+            entry = self.file_cache["cached_contents"].get(key)
+            if entry:
+                cached = await self._refresh_cached_content(key, entry)
+                if cached:
+                    return cached
+            return await self._create_cached_content(key, jurisdiction, prompt, model, plan)
+    
+    async def _refresh_cached_content(self, key: str, entry: Dict) -> Optional[CachedContext]:
+        """Confirm a stored cached content and extend its TTL if needed (None if it must be recreated)"""
+        expire_time = datetime.fromisoformat(entry["expire_time"]) if entry.get("expire_time") else None
+        
+        try:
+            if key not in self._verified_caches:
+                remote = await self.client.aio.caches.get(name=entry["name"])
+                expire_time = getattr(remote, "expire_time", None) or expire_time
+                self._verified_caches.add(key)
             
-            # Upload to Gemini and get file object
-            file_obj = self.upload_to_gemini(doc_bytes, doc_name)
-            if file_obj:
-                file_objects.append(file_obj)
+            if expire_time and expire_time.tzinfo is None:
+                expire_time = expire_time.replace(tzinfo=timezone.utc)
+            if expire_time is None or (
+                expire_time - datetime.now(timezone.utc) < timedelta(seconds=CONTEXT_CACHE_REFRESH_SECONDS)
+            ):
+                remote = await self.client.aio.caches.update(
+                    name=entry["name"],
+                    config=types.UpdateCachedContentConfig(ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s")
+                )
+                expire_time = getattr(remote, "expire_time", None)
+        except Exception as e:
+            print(f"Cached content {entry['name']} is no longer available: {e}")
+            del self.file_cache["cached_contents"][key]
+            self._verified_caches.discard(key)
+            self._save_cache()
+            return None
+        
+        entry["expire_time"] = expire_time.isoformat() if expire_time else None
+        self._save_cache()
+        return CachedContext(entry["name"], key, expire_time, entry.get("context", {}))
+    
+    async def _create_cached_content(
+        self,
+        key: str,
+        jurisdiction: str,
+        prompt: str,
+        model: str,
+        plan: ContextPlan
+    ) -> Optional[CachedContext]:
+        """Create cached content from the prompt and the jurisdiction's context plan"""
+        parts = ([types.Part.from_text(text=prompt)] if prompt else []) + context_parts(plan.items)
+        try:
+            remote = await self.client.aio.caches.create(
+                model=model,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"swms-{jurisdiction.lower()}-{self.manifest.version}",
+                    contents=[types.Content(role="user", parts=parts)],
+                    ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s"
+                )
+            )
+        except Exception as e:
+            # e.g. the model does not support caching or the context is below its minimum size
+            print(f"Warning: Could not create cached context for {key}: {e}")
+            self._caching_failures[key] = time.time()
+            return None
+        
+        self._caching_failures.pop(key, None)
+        expire_time = getattr(remote, "expire_time", None)
+        self.file_cache["cached_contents"][key] = {
+            "name": remote.name,
+            "expire_time": expire_time.isoformat() if expire_time else None,
+            "context": plan.summary()
+        }
+        self._verified_caches.add(key)
+        self._save_cache()
+        return CachedContext(remote.name, key, expire_time, plan.summary())
+    
+    async def validate_backend(self) -> Dict[str, Any]:
+        """
+        Check every manifest entry against the storage backend.
         
-        return file_objects
+        Returns a report with a per-document status of "ok", "missing",
+        "size_mismatch" or "error: ...".
+        """
+        documents = self.manifest.all_documents()
+        statuses = await asyncio.gather(*(self.backend.check(doc) for doc in documents))
+        report = {doc.path: status for doc, status in zip(documents, statuses)}
+        return {
+            "version": self.manifest.version,
+            "backend": self.backend.name,
+            "valid": all(status == "ok" for status in report.values()),
+            "documents": report
+        }
+    
+    def get_missing_documents(self) -> List[Dict[str, Any]]:
+        """List manifest entries currently in the negative cache"""
+        missing = []
+        for doc in self.manifest.all_documents():
+            missing_entry = self.file_cache["missing"].get(doc.path)
+            if not missing_entry:
+                continue
+            missing.append({
+                "path": doc.path,
+                "jurisdiction": doc.jurisdiction,
+                "name": doc.name,
+                "status_code": missing_entry.get("status_code"),
+                "last_checked": missing_entry.get("timestamp"),
+                "retry_after": missing_entry.get("timestamp", 0) + MISSING_CACHE_TTL_HOURS * 3600
+            })
+        return missing
     
     def get_jurisdiction_context(self, jurisdiction: str = "nsw") -> Dict[str, Any]:
         """Get jurisdiction-specific context information"""
@@ -248,4 +1174,4 @@ class R2ContextManager:
             List of Gemini file objects
         """
         # Simply return the file objects from get_context_files
-        return self.get_context_files(jurisdiction)
\ No newline at end of file
+        return await self.get_context_files(jurisdiction)
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Rate Limiter Module - Per-model token buckets and retry scheduling for Gemini calls
+
+Each model gets a requests-per-minute and a tokens-per-minute bucket. Callers
+queue (in arrival order) until both have capacity instead of failing, and
+429/5xx responses are retried with jittered exponential backoff that honours
+any retry-after hint. A throttled response pauses the whole model's queue,
+since every caller shares the same quota.
+"""
+
+import os
+import re
+import time
+import random
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# Per-model quotas as "model=rpm:tpm" pairs, e.g. "gemini-2.5-flash=1000:1000000,gemini-2.0-flash-exp=10:250000"
+GEMINI_RATE_LIMITS = os.getenv("SWMS_GEMINI_RATE_LIMITS", "")
+# Quota for models not listed in SWMS_GEMINI_RATE_LIMITS
+DEFAULT_REQUESTS_PER_MINUTE = int(os.getenv("SWMS_GEMINI_RPM", "60"))
+DEFAULT_TOKENS_PER_MINUTE = int(os.getenv("SWMS_GEMINI_TPM", "1000000"))
+
+# Retry scheduling for throttled or temporarily unavailable responses
+MAX_RETRIES = int(os.getenv("SWMS_GEMINI_MAX_RETRIES", "5"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+RETRY_DELAY_PATTERN = re.compile(r"retry[_ ]?delay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE)
+
+
+def parse_rate_limits(setting: str) -> Dict[str, Tuple[int, int]]:
+    """Parse SWMS_GEMINI_RATE_LIMITS into {model: (requests/min, tokens/min)}"""
+    limits = {}
+    for item in setting.split(","):
+        if "=" not in item:
+            continue
+        model, quota = item.split("=", 1)
+        try:
+            rpm, tpm = quota.split(":", 1)
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            print(f"Warning: Ignoring invalid rate limit '{item.strip()}' (expected model=rpm:tpm)")
+    return limits
+
+
+def error_status_code(error: Exception) -> Optional[int]:
+    """HTTP status code of an API error, if it has one"""
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    response = getattr(error, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Server-suggested delay from a Retry-After header or a RetryInfo retryDelay"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    match = RETRY_DELAY_PATTERN.search(f"{getattr(error, 'details', '')} {error}")
+    return float(match.group(1)) if match else None
+
+
+class TokenBucket:
+    """Bucket refilled continuously up to a per-minute capacity"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        """Add the tokens accrued since the last update"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (requests larger than the bucket wait for a full one)"""
+        self._refill()
+        shortfall = min(amount, self.capacity) - self.tokens
+        return max(0.0, shortfall / self.rate)
+
+    def consume(self, amount: float):
+        """Take tokens; the balance may go negative to account for underestimates"""
+        self._refill()
+        self.tokens -= amount
+
+
+class ModelRateLimiter:
+    """Request and token buckets for one model, with a FIFO queue of waiting callers"""
+
+    def __init__(self, model: str, requests_per_minute: int, tokens_per_minute: int):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        # asyncio.Lock wakes waiters in arrival order, so the queue is FIFO
+        self._queue_lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.queue_depth = 0
+        self.counters = {
+            "requests": 0,
+            "throttled": 0,
+            "rate_limited_responses": 0,
+            "retries": 0,
+            "failures": 0
+        }
+
+    async def acquire(self, estimated_tokens: int):
+        """Wait until one request and estimated_tokens fit the quota, then take them"""
+        self.queue_depth += 1
+        try:
+            async with self._queue_lock:
+                throttled = False
+                while True:
+                    delay = max(
+                        self._paused_until - time.monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(estimated_tokens)
+                    )
+                    if delay <= 0:
+                        break
+                    if not throttled:
+                        self.counters["throttled"] += 1
+                        throttled = True
+                    await asyncio.sleep(delay)
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+                self.counters["requests"] += 1
+        finally:
+            self.queue_depth -= 1
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Correct the token bucket once the actual usage is known"""
+        if actual_tokens is not None:
+            self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def pause(self, seconds: float):
+        """Hold every queued caller for this model, e.g. after a 429"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, counters and remaining quota"""
+        return {
+            **self.counters,
+            "queue_depth": self.queue_depth,
+            "paused_for_seconds": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity
+        }
+
+
+class RateLimiter:
+    """Per-model limiters plus the retry scheduler shared by all Gemini calls"""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        self.limits = parse_rate_limits(GEMINI_RATE_LIMITS) if limits is None else limits
+        self._models: Dict[str, ModelRateLimiter] = {}
+
+    def for_model(self, model: str) -> ModelRateLimiter:
+        """The limiter for a model, created with its configured quota on first use"""
+        limiter = self._models.get(model)
+        if limiter is None:
+            rpm, tpm = self.limits.get(model, (DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE))
+            limiter = self._models[model] = ModelRateLimiter(model, rpm, tpm)
+        return limiter
+
+    def backoff_seconds(self, attempt: int, error: Exception) -> float:
+        """Delay before retry number attempt: the server's hint, else full-jitter exponential backoff"""
+        hint = retry_after_seconds(error)
+        if hint is not None:
+            return hint + random.uniform(0, BACKOFF_BASE_SECONDS)
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    async def call(
+        self,
+        model: str,
+        request: Callable[[], Awaitable[Any]],
+        estimated_tokens: int = 0
+    ) -> Any:
+        """
+        Run a model request within the model's quota, retrying throttled attempts.
+
+        Args:
+            model: Model id the quota applies to
+            request: Zero-argument coroutine function that makes the API call
+            estimated_tokens: Expected prompt plus output tokens, corrected from usage_metadata
+
+        Raises:
+            The last error once MAX_RETRIES is exhausted, or any non-retryable error
+        """
+        limiter = self.for_model(model)
+        for attempt in range(MAX_RETRIES + 1):
+            await limiter.acquire(estimated_tokens)
+            try:
+                response = await request()
+            except Exception as e:
+                status = error_status_code(e)
+                if status == 429:
+                    limiter.counters["rate_limited_responses"] += 1
+                if status not in RETRYABLE_STATUS_CODES or attempt == MAX_RETRIES:
+                    limiter.counters["failures"] += 1
+                    raise
+                delay = self.backoff_seconds(attempt, e)
+                print(f"Gemini {model} returned {status}; retrying in {delay:.1f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+                limiter.counters["retries"] += 1
+                if status == 429:
+                    limiter.pause(delay)
+                else:
+                    await asyncio.sleep(delay)
+                continue
+
+            usage = getattr(response, "usage_metadata", None)
+            limiter.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-model limiter stats"""
+        return {model: limiter.stats() for model, limiter in self._models.items()}
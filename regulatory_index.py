@@ -0,0 +1,278 @@
+"""
+Regulatory Index Module - BM25 retrieval over regulatory document text
+
+Builds an inverted index of clause/heading-sized chunks extracted from
+regulatory_documents/, so prompts can carry the most relevant clauses
+instead of whole codes of practice.
+
+Usage:
+    python regulatory_index.py [output_path]
+
+Requires: pypdf (PDF text extraction) and python-docx (DOCX text extraction)
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import math
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Iterable, Any
+
+from regulatory_manifest import LOCAL_DOCUMENTS_DIR, RegulatoryManifest
+
+try:
+    from pypdf import PdfReader
+    PDF_EXTRACTION_AVAILABLE = True
+except ImportError:
+    PDF_EXTRACTION_AVAILABLE = False
+
+try:
+    from docx import Document
+    DOCX_EXTRACTION_AVAILABLE = True
+except ImportError:
+    DOCX_EXTRACTION_AVAILABLE = False
+
+# Where the offline pipeline writes the index and the server reads it from
+INDEX_PATH = Path(os.getenv("SWMS_REGULATORY_INDEX", str(Path(__file__).parent / "regulatory_index.json.gz")))
+
+# Chunk size bounds, in characters
+MAX_CHUNK_CHARS = 1500
+MIN_CHUNK_CHARS = 200
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Lines that start a new clause or section, e.g. "4.2 Working at heights", "Part 6.3", "Schedule 1"
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"\d+(?:\.\d+)*\.?\s+[A-Z]"
+    r"|(?:Part|Division|Section|Schedule|Appendix|Chapter|Regulation)\s+[\dA-Z]"
+    r"|[A-Z][A-Z0-9 ,&/()\-]{6,80}$"
+    r")"
+)
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be been by for from has have if in into is it its of on or such
+that the their there these this to was were which will with must should may any all
+not no other than then they those under where who
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords and single characters removed"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def extract_text(file_path: Path) -> str:
+    """Extract plain text from a PDF or DOCX file ('' if unsupported)"""
+    suffix = file_path.suffix.lower()
+    if suffix == ".pdf":
+        if not PDF_EXTRACTION_AVAILABLE:
+            raise ImportError("pypdf is required to extract PDF text")
+        reader = PdfReader(str(file_path))
+        return "\n".join(page.extract_text() or "" for page in reader.pages)
+    if suffix == ".docx":
+        if not DOCX_EXTRACTION_AVAILABLE:
+            raise ImportError("python-docx is required to extract DOCX text")
+        doc = Document(str(file_path))
+        return "\n".join(para.text for para in doc.paragraphs)
+    return ""
+
+
+def chunk_text(text: str) -> List[Dict[str, str]]:
+    """
+    Split document text into clause/heading-sized chunks.
+
+    A new chunk starts at each heading-like line; long sections are split on
+    paragraph boundaries and tiny ones are merged into their predecessor.
+    """
+    sections = []
+    heading, lines = "", []
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            lines.append("")
+            continue
+        if HEADING_PATTERN.match(stripped) and len(stripped) <= 120:
+            if any(lines):
+                sections.append((heading, lines))
+            heading, lines = stripped, []
+        lines.append(stripped)
+    if any(lines):
+        sections.append((heading, lines))
+
+    chunks = []
+    for heading, lines in sections:
+        body = re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+        paragraphs = [p for p in body.split("\n\n") if p.strip()]
+        current = ""
+        for paragraph in paragraphs:
+            if current and len(current) + len(paragraph) > MAX_CHUNK_CHARS:
+                chunks.append({"heading": heading, "text": current})
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            if chunks and len(current) < MIN_CHUNK_CHARS and len(chunks[-1]["text"]) + len(current) <= MAX_CHUNK_CHARS:
+                chunks[-1]["text"] += "\n\n" + current
+            else:
+                chunks.append({"heading": heading, "text": current})
+    return chunks
+
+
+class RegulatoryIndex:
+    """BM25 inverted index over regulatory text chunks"""
+
+    def __init__(
+        self,
+        chunks: List[Dict[str, Any]],
+        postings: Dict[str, List[List[int]]],
+        corpus_version: Optional[str] = None
+    ):
+        self.chunks = chunks
+        self.postings = postings
+        self.corpus_version = corpus_version
+        self.avg_length = (sum(c["length"] for c in chunks) / len(chunks)) if chunks else 0.0
+
+    @classmethod
+    def build(cls, base_dir: Path = LOCAL_DOCUMENTS_DIR) -> "RegulatoryIndex":
+        """
+        Extract, chunk and index every document under base_dir/<jurisdiction>/.
+
+        Byte-identical copies (same sha256) are indexed once, so retrieval
+        never returns the same clause twice. National documents go first, so a
+        state copy of a national document stays visible to every jurisdiction.
+        """
+        manifest = RegulatoryManifest.from_directory(base_dir)
+        chunks = []
+        postings: Dict[str, List[List[int]]] = {}
+        indexed_hashes: Dict[str, str] = {}
+
+        documents = sorted(manifest.all_documents(), key=lambda doc: doc.jurisdiction != "national")
+        for doc in documents:
+            if doc.sha256 in indexed_hashes:
+                print(f"  - Skipped {doc.path} (duplicate of {indexed_hashes[doc.sha256]})")
+                continue
+            indexed_hashes[doc.sha256] = doc.path
+            try:
+                text = extract_text(Path(base_dir) / doc.path)
+            except Exception as e:
+                print(f"  ✗ Could not extract {doc.path}: {e}")
+                continue
+            if not text.strip():
+                print(f"  - Skipped {doc.path} (no extractable text)")
+                continue
+
+            doc_chunks = chunk_text(text)
+            for chunk in doc_chunks:
+                chunk_id = len(chunks)
+                terms = Counter(tokenize(f"{chunk['heading']} {chunk['text']}"))
+                for term, frequency in terms.items():
+                    postings.setdefault(term, []).append([chunk_id, frequency])
+                chunks.append({
+                    "jurisdiction": doc.jurisdiction,
+                    "path": doc.path,
+                    "heading": chunk["heading"],
+                    "text": chunk["text"],
+                    "length": sum(terms.values())
+                })
+            print(f"  ✓ Indexed {doc.path} ({len(doc_chunks)} chunks)")
+
+        return cls(chunks, postings, manifest.version)
+
+    def save(self, index_path: Path = INDEX_PATH):
+        """Write the index as gzipped JSON"""
+        with gzip.open(index_path, 'wt', encoding='utf-8') as f:
+            json.dump({
+                "corpus_version": self.corpus_version,
+                "chunks": self.chunks,
+                "postings": self.postings
+            }, f)
+
+    @classmethod
+    def load(cls, index_path: Path = INDEX_PATH, corpus_version: Optional[str] = None) -> "RegulatoryIndex":
+        """
+        Read an index written by save().
+
+        Raises:
+            ValueError: If corpus_version is given and the index was built from another corpus
+        """
+        with gzip.open(index_path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        if corpus_version and data.get("corpus_version") != corpus_version:
+            raise ValueError(
+                f"index was built for corpus version {data.get('corpus_version')}, "
+                f"not {corpus_version}; rebuild it with python regulatory_index.py"
+            )
+        return cls(data["chunks"], data["postings"], data.get("corpus_version"))
+
+    def search(
+        self,
+        query: str,
+        jurisdictions: Optional[Iterable[str]] = None,
+        top_k: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the top_k chunks for the query by BM25 score.
+
+        Args:
+            query: Free text, e.g. SWMS content or a job description
+            jurisdictions: Only consider chunks from these jurisdictions (all if None)
+            top_k: Number of chunks to return
+        """
+        allowed = {j.lower() for j in jurisdictions} if jurisdictions else None
+        total_chunks = len(self.chunks)
+        scores: Dict[int, float] = {}
+
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (total_chunks - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for chunk_id, frequency in term_postings:
+                chunk = self.chunks[chunk_id]
+                if allowed is not None and chunk["jurisdiction"] not in allowed:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk["length"] / (self.avg_length or 1))
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [
+            {
+                "path": self.chunks[chunk_id]["path"],
+                "jurisdiction": self.chunks[chunk_id]["jurisdiction"],
+                "heading": self.chunks[chunk_id]["heading"],
+                "text": self.chunks[chunk_id]["text"],
+                "score": round(score, 3)
+            }
+            for chunk_id, score in ranked
+        ]
+
+
+def format_clauses(results: List[Dict[str, Any]]) -> str:
+    """Render search results as a prompt section"""
+    sections = []
+    for result in results:
+        title = f"{result['path']}" + (f" — {result['heading']}" if result["heading"] else "")
+        sections.append(f"### {title}\n{result['text']}")
+    return "## Relevant Regulatory Clauses\n\n" + "\n\n".join(sections)
+
+
+def main():
+    """Build the retrieval index from regulatory_documents/"""
+    output_path = Path(sys.argv[1]) if len(sys.argv) > 1 else INDEX_PATH
+    print("Building regulatory retrieval index")
+    print("=" * 60)
+
+    index = RegulatoryIndex.build(LOCAL_DOCUMENTS_DIR)
+    index.save(output_path)
+
+    print(f"\nIndexed {len(index.chunks)} chunks, {len(index.postings)} terms "
+          f"(corpus version {index.corpus_version}) -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
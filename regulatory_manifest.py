@@ -0,0 +1,267 @@
+"""
+Regulatory Manifest Module - Immutable, versioned list of regulatory documents by jurisdiction
+
+Usage:
+    python regulatory_manifest.py [output_path]
+
+Running the module builds a manifest (with sizes and hashes) from the PDFs
+under regulatory_documents/ and writes it to regulatory_documents/manifest.json.
+"""
+
+import os
+import sys
+import json
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, Any
+
+# Local copy of the corpus, laid out as <jurisdiction>/<document> like the R2 bucket
+LOCAL_DOCUMENTS_DIR = Path(__file__).parent / "regulatory_documents"
+# Manifest file used when SWMS_REGULATORY_MANIFEST is not set
+DEFAULT_MANIFEST_PATH = LOCAL_DOCUMENTS_DIR / "manifest.json"
+
+# Only PDFs can be attached as Gemini context; Word sources are published as
+# <name>-converted.pdf by convert_and_upload_docs.py
+CONTEXT_DOCUMENT_SUFFIX = ".pdf"
+WORD_DOCUMENT_SUFFIXES = (".doc", ".docx")
+CONVERTED_PDF_SUFFIX = "-converted.pdf"
+
+# Built-in document list used when no manifest file is available
+DEFAULT_REGULATORY_DOCUMENTS = {
+    "national": (
+        "safe-work-australia-swms-info-sheet.pdf",
+        "model-code-practice-construction.pdf",
+        "high-risk-construction-work-list.pdf"
+    ),
+    "nsw": (
+        "nsw-whs-regulation-2017.pdf",
+        "safework-nsw-swms-template.pdf",
+        "nsw-construction-cop.pdf"
+    ),
+    "vic": (
+        "vic-ohs-regulations-2017.pdf",
+        "worksafe-vic-construction-cop.pdf"
+    ),
+    "qld": (
+        "qld-whs-regulation-2011.pdf",
+        "worksafe-qld-swms-guide.pdf"
+    ),
+    "wa": (
+        "wa-whs-regulations-2022.pdf",
+        "worksafe-wa-construction-cop.pdf"
+    ),
+    "sa": (
+        "sa-whs-regulations-2012.pdf",
+        "safework-sa-swms-template.pdf"
+    ),
+    "tas": (
+        "tas-whs-regulations-2012.pdf",
+        "worksafe-tas-swms-guide.pdf"
+    ),
+    "act": (
+        "act-whs-regulation-2011.pdf",
+        "worksafe-act-swms-guide.pdf"
+    ),
+    "nt": (
+        "nt-whs-regulations-2011.pdf",
+        "nt-worksafe-construction-cop.pdf"
+    )
+}
+
+
+@dataclass(frozen=True)
+class ManifestDocument:
+    """A single regulatory document; size and sha256 are optional"""
+    jurisdiction: str
+    name: str
+    size: Optional[int] = None
+    sha256: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        """Object key in R2 and path relative to regulatory_documents/"""
+        return f"{self.jurisdiction}/{self.name}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the manifest file"""
+        return {"name": self.name, "size": self.size, "sha256": self.sha256}
+
+
+@dataclass(frozen=True)
+class RegulatoryManifest:
+    """Frozen per-jurisdiction document tuples plus a corpus version stamp"""
+    version: str
+    documents: Mapping[str, Tuple[ManifestDocument, ...]] = field(default_factory=dict)
+
+    def __post_init__(self):
+        # Freeze the mapping itself so callers cannot add or replace jurisdictions
+        object.__setattr__(self, "documents", MappingProxyType({
+            jurisdiction: tuple(docs) for jurisdiction, docs in self.documents.items()
+        }))
+
+    def jurisdictions(self) -> List[str]:
+        """All jurisdictions listed in the manifest"""
+        return list(self.documents.keys())
+
+    def documents_for(self, jurisdiction: str) -> Tuple[ManifestDocument, ...]:
+        """National documents followed by the jurisdiction's own documents"""
+        jurisdiction = jurisdiction.lower()
+        national = self.documents.get("national", ())
+        if jurisdiction == "national":
+            return national
+        return national + self.documents.get(jurisdiction, ())
+
+    def all_documents(self) -> Tuple[ManifestDocument, ...]:
+        """Every document in the manifest"""
+        return tuple(doc for docs in self.documents.values() for doc in docs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize for the manifest file"""
+        return {
+            "version": self.version,
+            "documents": {
+                jurisdiction: [doc.to_dict() for doc in docs]
+                for jurisdiction, docs in self.documents.items()
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RegulatoryManifest":
+        """
+        Build a manifest from its serialized form.
+
+        Documents may be given as plain names or as {"name", "size", "sha256"}
+        objects. If no version is given, one is derived from the contents.
+        """
+        documents = {}
+        for jurisdiction, entries in data.get("documents", {}).items():
+            jurisdiction = jurisdiction.lower()
+            docs = []
+            for entry in entries:
+                if isinstance(entry, str):
+                    entry = {"name": entry}
+                docs.append(ManifestDocument(
+                    jurisdiction=jurisdiction,
+                    name=entry["name"],
+                    size=entry.get("size"),
+                    sha256=entry.get("sha256")
+                ))
+            documents[jurisdiction] = tuple(docs)
+
+        version = data.get("version") or _compute_version(documents)
+        return cls(version=version, documents=documents)
+
+    @classmethod
+    def from_directory(cls, base_dir: Path = LOCAL_DOCUMENTS_DIR) -> "RegulatoryManifest":
+        """
+        Build a manifest, with sizes and hashes, from a local corpus directory.
+
+        Only PDFs are listed. A Word document is represented by its converted
+        PDF (<name>-converted.pdf) when that is present, and skipped otherwise.
+        """
+        documents = {}
+        for jurisdiction_dir in sorted(p for p in Path(base_dir).iterdir() if p.is_dir()):
+            docs = []
+            files = sorted(p for p in jurisdiction_dir.iterdir() if p.is_file())
+            for doc_file in files:
+                suffix = doc_file.suffix.lower()
+                if suffix in WORD_DOCUMENT_SUFFIXES:
+                    converted = doc_file.with_name(doc_file.stem + CONVERTED_PDF_SUFFIX)
+                    if converted not in files:
+                        print(f"Skipping {jurisdiction_dir.name}/{doc_file.name}: no {converted.name} (run convert_and_upload_docs.py)")
+                    continue
+                if suffix != CONTEXT_DOCUMENT_SUFFIX:
+                    continue
+                docs.append(ManifestDocument(
+                    jurisdiction=jurisdiction_dir.name,
+                    name=doc_file.name,
+                    size=doc_file.stat().st_size,
+                    sha256=_hash_file(doc_file)
+                ))
+            if docs:
+                documents[jurisdiction_dir.name] = tuple(docs)
+        return cls(version=_compute_version(documents), documents=documents)
+
+
+def _hash_file(file_path: Path) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _compute_version(documents: Mapping[str, Tuple[ManifestDocument, ...]]) -> str:
+    """Derive a stable corpus version from the manifest contents"""
+    canonical = json.dumps(
+        {j: [doc.to_dict() for doc in docs] for j, docs in sorted(documents.items())},
+        sort_keys=True
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def load_manifest(manifest_path: Optional[str] = None) -> RegulatoryManifest:
+    """
+    Load the regulatory manifest.
+
+    Uses manifest_path, then SWMS_REGULATORY_MANIFEST, then
+    regulatory_documents/manifest.json, falling back to the built-in list.
+    """
+    manifest_path = manifest_path or os.getenv("SWMS_REGULATORY_MANIFEST")
+    path = Path(manifest_path) if manifest_path else DEFAULT_MANIFEST_PATH
+
+    if path.exists():
+        try:
+            with open(path, 'r') as f:
+                return RegulatoryManifest.from_dict(json.load(f))
+        except Exception as e:
+            print(f"Warning: Could not load regulatory manifest {path}: {e}")
+    elif manifest_path:
+        print(f"Warning: Regulatory manifest not found: {path}")
+
+    return RegulatoryManifest.from_dict({"documents": DEFAULT_REGULATORY_DOCUMENTS})
+
+
+def validate_manifest(manifest: RegulatoryManifest, base_dir: Path = LOCAL_DOCUMENTS_DIR) -> Dict[str, Any]:
+    """
+    Check every manifest entry against a local corpus directory.
+
+    Returns a report with a per-document status of "ok", "missing",
+    "size_mismatch" or "hash_mismatch".
+    """
+    documents = {}
+    for doc in manifest.all_documents():
+        local_file = Path(base_dir) / doc.path
+        if not local_file.is_file():
+            status = "missing"
+        elif doc.size is not None and local_file.stat().st_size != doc.size:
+            status = "size_mismatch"
+        elif doc.sha256 and _hash_file(local_file) != doc.sha256:
+            status = "hash_mismatch"
+        else:
+            status = "ok"
+        documents[doc.path] = status
+
+    return {
+        "version": manifest.version,
+        "valid": all(status == "ok" for status in documents.values()),
+        "documents": documents
+    }
+
+
+def main():
+    """Write a manifest built from regulatory_documents/"""
+    output_path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_MANIFEST_PATH
+    manifest = RegulatoryManifest.from_directory(LOCAL_DOCUMENTS_DIR)
+
+    with open(output_path, 'w') as f:
+        json.dump(manifest.to_dict(), f, indent=2)
+
+    print(f"Wrote manifest version {manifest.version} with {len(manifest.all_documents())} documents to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
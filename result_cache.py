@@ -0,0 +1,200 @@
+"""
+Result Cache Module - Two-tier (memory LRU + disk) cache for analysis results
+
+Keys are content-based: the SWMS content hash, tool, parameters, prompt
+template hash, model and regulatory corpus version. Re-uploading the same SWMS
+(which yields a new Gemini document_id) still hits the cache.
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Any
+
+# Cache configuration
+RESULT_CACHE_DIR = Path(os.getenv("SWMS_RESULT_CACHE_DIR", "/tmp/swms-result-cache"))
+RESULT_CACHE_TTL_HOURS = float(os.getenv("SWMS_RESULT_CACHE_TTL_HOURS", "168"))
+# Entries kept in the in-memory LRU tier
+RESULT_CACHE_MEMORY_ENTRIES = int(os.getenv("SWMS_RESULT_CACHE_MEMORY_ENTRIES", "256"))
+# Size limit for the on-disk tier; oldest entries are evicted first
+RESULT_CACHE_MAX_MB = float(os.getenv("SWMS_RESULT_CACHE_MAX_MB", "100"))
+
+# Values for the tools' cache parameter
+CACHE_MODES = ("bypass", "prefer", "only")
+
+
+class ResultCache:
+    """In-memory LRU in front of an on-disk JSON store, with TTL and size eviction"""
+
+    def __init__(
+        self,
+        cache_dir: Path = RESULT_CACHE_DIR,
+        ttl_hours: float = RESULT_CACHE_TTL_HOURS,
+        max_memory_entries: int = RESULT_CACHE_MEMORY_ENTRIES,
+        max_disk_mb: float = RESULT_CACHE_MAX_MB
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = int(max_disk_mb * 1024 * 1024)
+        # key -> (stored_at, result), least recently used first
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # key -> (stored_at, size in bytes) for the disk tier, oldest first
+        self._disk_index: "OrderedDict[str, Tuple[float, int]]" = self._scan_disk()
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "expired": 0,
+            "evictions": 0,
+            "bypassed": 0
+        }
+
+    def _scan_disk(self) -> "OrderedDict[str, Tuple[float, int]]":
+        """Index the entries already on disk"""
+        entries = []
+        for entry_file in self.cache_dir.glob("*.json"):
+            try:
+                stat = entry_file.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, entry_file.stem, stat.st_size))
+        return OrderedDict((key, (stored_at, size)) for stored_at, key, size in sorted(entries))
+
+    @staticmethod
+    def make_key(
+        content_hash: str,
+        tool: str,
+        params: Dict[str, Any],
+        prompt: str,
+        model: str,
+        corpus_version: str
+    ) -> str:
+        """Build a cache key from the inputs that determine a result"""
+        canonical = json.dumps({
+            "content": content_hash,
+            "tool": tool,
+            "params": params,
+            "prompt": hashlib.sha256(prompt.encode()).hexdigest(),
+            "model": model,
+            "corpus": corpus_version
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        """On-disk location of an entry"""
+        return self.cache_dir / f"{key}.json"
+
+    def _is_fresh(self, stored_at: float) -> bool:
+        """Check if an entry stored at stored_at is within the TTL"""
+        return time.time() - stored_at < self.ttl_seconds
+
+    def get(self, key: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Look up a result.
+
+        Returns:
+            (result, tier) where tier is "memory" or "disk", or (None, None) on a miss
+        """
+        cached = self._memory.get(key)
+        if cached:
+            stored_at, result = cached
+            if self._is_fresh(stored_at):
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return result, "memory"
+            del self._memory[key]
+
+        if key in self._disk_index:
+            stored_at, _ = self._disk_index[key]
+            if self._is_fresh(stored_at):
+                try:
+                    with open(self._entry_path(key), 'r') as f:
+                        result = json.load(f)["result"]
+                    self._remember(key, stored_at, result)
+                    self.counters["disk_hits"] += 1
+                    return result, "disk"
+                except Exception as e:
+                    print(f"Warning: Could not read cached result {key}: {e}")
+            else:
+                self.counters["expired"] += 1
+            self._delete_disk_entry(key)
+
+        self.counters["misses"] += 1
+        return None, None
+
+    def put(self, key: str, result: Dict[str, Any]):
+        """Store a result in both tiers"""
+        stored_at = time.time()
+        self._remember(key, stored_at, result)
+
+        try:
+            # Write atomically so a concurrent reader never sees a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"stored_at": stored_at, "result": result}, f)
+            os.replace(tmp_path, self._entry_path(key))
+            size = self._entry_path(key).stat().st_size
+        except Exception as e:
+            print(f"Warning: Could not write cached result {key}: {e}")
+            return
+
+        self._disk_index.pop(key, None)
+        self._disk_index[key] = (stored_at, size)
+        self.counters["stores"] += 1
+        self._evict_disk()
+
+    def _remember(self, key: str, stored_at: float, result: Dict[str, Any]):
+        """Put a result in the memory tier, evicting the least recently used"""
+        self._memory[key] = (stored_at, result)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop expired entries, then the oldest ones until under the size limit"""
+        for key, (stored_at, _) in list(self._disk_index.items()):
+            if self._is_fresh(stored_at):
+                break
+            self._delete_disk_entry(key)
+            self.counters["expired"] += 1
+
+        total = sum(size for _, size in self._disk_index.values())
+        while total > self.max_disk_bytes and self._disk_index:
+            key, (_, size) = next(iter(self._disk_index.items()))
+            self._delete_disk_entry(key)
+            self._memory.pop(key, None)
+            self.counters["evictions"] += 1
+            total -= size
+
+    def _delete_disk_entry(self, key: str):
+        """Remove an entry from the disk tier"""
+        self._disk_index.pop(key, None)
+        try:
+            self._entry_path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Remove every cached result"""
+        for key in list(self._disk_index):
+            self._delete_disk_entry(key)
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters plus current tier sizes"""
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_index),
+            "disk_bytes": sum(size for _, size in self._disk_index.values())
+        }
@@ -3,25 +3,52 @@ SWMS MCP Server - Safe Work Method Statement Analysis
 """
 
 import os
-import io
-import json
 import base64
-import tempfile
-import requests
+import asyncio
 import uuid
 import time
-import mimetypes
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 from fastmcp import FastMCP
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 from starlette.requests import Request
 from starlette.responses import JSONResponse
 
-# Import R2 context manager
-from r2_context import R2ContextManager
+# Import R2 context helpers and the shared Gemini gateway
+from r2_context import REGULATORY_MANIFEST, context_parts, estimate_file_tokens
+from gemini_gateway import get_gateway
+from result_cache import ResultCache, CACHE_MODES
+from compliance_scoring import (
+    AreaScoreStore,
+    SCORE_AREAS,
+    NUMPY_AVAILABLE,
+    compliance_level,
+    load_weight_profiles,
+    normalize_weights,
+    weighted_scores
+)
+from regulatory_manifest import validate_manifest
+from ingestion import (
+    DOCX_MIME_TYPE,
+    PDF_MIME_TYPE,
+    SpooledUpload,
+    UnsupportedFileType,
+    UploadError,
+    UploadTooLarge,
+    check_docx_package,
+    download_to_spool,
+    inspect_local_file,
+    receive_multipart_file,
+    spool_bytes
+)
+from document_registry import GEMINI_FILE_TTL_HOURS, DocumentRegistry
+from structured_output import StructuredOutputError, generate_structured
+from prompts.swms_schemas import (
+    COMPLIANCE_REPORT_SCHEMA,
+    SCORED_COMPLIANCE_REPORT_SCHEMA,
+    quick_check_schema
+)
 
 # Import libraries for DOCX to PDF conversion
 try:
@@ -39,16 +66,132 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API client
+# Configure Gemini API client (shared with tools/ through the gateway)
 api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+gateway = get_gateway()
 client = None
 r2_context = None
 if api_key:
-    client = genai.Client(api_key=api_key)
-    r2_context = R2ContextManager(client)
+    client = gateway.client
+    r2_context = gateway.context
+
+# Jurisdictions whose regulatory context is preloaded in the background at startup,
+# e.g. "nsw,vic" or "all". Empty disables warm-up.
+_warmup_setting = os.getenv("SWMS_WARMUP_JURISDICTIONS", "").strip().lower()
+if _warmup_setting == "all":
+    WARMUP_JURISDICTIONS = REGULATORY_MANIFEST.jurisdictions()
+else:
+    WARMUP_JURISDICTIONS = [j.strip() for j in _warmup_setting.split(",") if j.strip()]
+
+def start_context_warmup():
+    """Start the regulatory context warm-up task (no-op if disabled or already running)"""
+    if r2_context and WARMUP_JURISDICTIONS:
+        r2_context.start_warmup(WARMUP_JURISDICTIONS)
+
+async def build_regulatory_contents(
+    jurisdiction: Optional[str],
+    prompt: str,
+    model: str,
+    reserved_tokens: int = 0
+) -> tuple[list, Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Prompt contents to send ahead of the SWMS, for a jurisdiction.
+    
+    Uses the jurisdiction's server-side cached context when available, so only
+    the SWMS needs sending; otherwise the prompt and regulatory context go inline.
+    Returns (contents, cached content name or None, regulatory context summary).
+    """
+    if not r2_context or not jurisdiction:
+        return [prompt], None, None
+    
+    try:
+        cached_context = await r2_context.get_cached_context(jurisdiction, prompt, model, reserved_tokens)
+        if cached_context:
+            return [], cached_context.name, dict(cached_context.context, cached_content=cached_context.name)
+    except Exception as e:
+        print(f"Warning: Could not use cached context: {e}")
+    
+    try:
+        context_plan = await r2_context.get_prompt_context(jurisdiction, reserved_tokens=reserved_tokens)
+    except Exception as e:
+        print(f"Warning: Could not load R2 context: {e}")
+        return [prompt], None, None
+    return [prompt] + context_parts(context_plan.items), None, context_plan.summary()
+
+async def regulatory_context_fingerprint(
+    jurisdiction: Optional[str],
+    reserved_tokens: int = 0
+) -> Optional[Dict[str, Any]]:
+    """
+    Mode, token budget and document fingerprint of the regulatory context a
+    request would carry, so result cache keys change with SWMS_CONTEXT_MODE,
+    SWMS_CONTEXT_TOKEN_BUDGET or the planned documents (None without context).
+    """
+    if not r2_context or not jurisdiction:
+        return None
+    try:
+        plan = await r2_context.get_prompt_context(jurisdiction, reserved_tokens=reserved_tokens)
+    except Exception as e:
+        print(f"Warning: Could not plan regulatory context for the cache key: {e}")
+        return None
+    return {"mode": plan.mode, "budget": plan.budget, "documents": plan.fingerprint()}
+
+# Two-tier cache for analysis results, keyed by SWMS content rather than document_id
+result_cache = ResultCache()
+# Area scores per document, for local re-scoring with other weight profiles
+area_scores = AreaScoreStore()
+
+def document_content_hash(gemini_file: Any) -> str:
+    """Content hash of an uploaded SWMS for result cache keys (falls back to the file name)"""
+    return getattr(gemini_file, "sha256_hash", None) or gemini_file.name
+
+def cache_lookup(cache: str, cache_key: str) -> Optional[Dict[str, Any]]:
+    """
+    Apply a tool's cache mode before calling the model.
+    
+    Returns the response to send (a cached result, or an error for an "only"
+    miss), or None if the tool should go on to call the model.
+    """
+    if cache == "bypass":
+        result_cache.counters["bypassed"] += 1
+        return None
+    
+    result, tier = result_cache.get(cache_key)
+    if result is not None:
+        return dict(result, cache={"hit": True, "tier": tier})
+    if cache == "only":
+        return {
+            "status": "error",
+            "message": "No cached result for this document and parameters",
+            "cache": {"hit": False}
+        }
+    return None
+
+def cache_store(cache_key: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Cache a successful result and return it marked as a cache miss"""
+    if result.get("status") == "success":
+        result_cache.put(cache_key, result)
+    return dict(result, cache={"hit": False})
+
+# Open lifespans; over HTTP the lifespan runs once per MCP session, so the shared
+# pools are only released when the last one ends
+_active_lifespans = 0
+
+@asynccontextmanager
+async def server_lifespan(server):
+    """Start background warm-up alongside the server and release shared connections on shutdown"""
+    global _active_lifespans
+    _active_lifespans += 1
+    start_context_warmup()
+    try:
+        yield {}
+    finally:
+        _active_lifespans -= 1
+        if _active_lifespans == 0:
+            await gateway.close()
 
 # MUST be at module level for FastMCP Cloud
-mcp = FastMCP("swms-analysis-server")
+mcp = FastMCP("swms-analysis-server", lifespan=server_lifespan)
 
 # Temporary file storage configuration
 TEMP_STORAGE_DIR = Path("/tmp/swms-file-uploads")
@@ -57,55 +200,42 @@ FILE_TTL_HOURS = 24  # Files expire after 24 hours
 
 # Note: We use Gemini file IDs directly instead of local storage for better persistence
 
+# Uploaded documents (with their content hash and expiry), persisted across restarts.
+# Re-uploads of the same SWMS bytes reuse the live Gemini document_id.
+document_registry = DocumentRegistry(TEMP_STORAGE_DIR / "documents.sqlite3")
+
 def cleanup_expired_files():
-    """Remove expired files from storage"""
-    current_time = time.time()
-    expired_files = []
-    
-    for doc_id, file_info in uploaded_files.items():
-        if current_time - file_info['upload_time'] > (FILE_TTL_HOURS * 3600):
-            expired_files.append(doc_id)
-            
-            # Remove physical file
-            file_path = file_info.get('file_path')
-            if file_path and Path(file_path).exists():
-                try:
-                    Path(file_path).unlink()
-                except Exception as e:
-                    print(f"Warning: Could not delete expired file {file_path}: {e}")
-    
-    # Remove from memory
-    for doc_id in expired_files:
-        del uploaded_files[doc_id]
-    
-    return len(expired_files)
-
-def save_uploaded_file(file_data: bytes, filename: str) -> tuple[str, str]:
-    """Save uploaded file and return document_id and file_path"""
-    # Clean up expired files first
-    cleanup_expired_files()
-    
-    # Generate unique document ID
-    doc_id = str(uuid.uuid4())
-    
-    # Determine file extension
-    mime_type, _ = mimetypes.guess_type(filename)
-    if filename.lower().endswith('.pdf'):
-        ext = '.pdf'
-        mime_type = 'application/pdf'
-    elif filename.lower().endswith('.docx'):
-        ext = '.docx'
-        mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-    else:
-        ext = Path(filename).suffix or '.bin'
-        mime_type = mime_type or 'application/octet-stream'
+    """Remove expired documents from the registry and their local files from storage"""
+    expired = document_registry.pop_expired()
+    for row in expired:
+        file_path = row.get('file_path')
+        if file_path and Path(file_path).exists():
+            try:
+                Path(file_path).unlink()
+            except Exception as e:
+                print(f"Warning: Could not delete expired file {file_path}: {e}")
     
-    # Save file to temporary storage
-    file_path = TEMP_STORAGE_DIR / f"{doc_id}{ext}"
-    with open(file_path, 'wb') as f:
-        f.write(file_data)
+    # Area scores are keyed by Gemini document ids, so they expire with them
+    area_scores.remove([row["document_id"] for row in expired])
+    area_scores.prune(GEMINI_FILE_TTL_HOURS * 3600)
     
-    return doc_id, str(file_path), mime_type
+    return len(expired)
+
+def register_upload(
+    content_hash: str,
+    gemini_file: Any,
+    size_bytes: int,
+    filename: str,
+    file_path: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """Record a new upload in the document registry, clearing out expired ones first"""
+    cleanup_expired_files()
+    document_registry.record(
+        content_hash, gemini_file, size_bytes,
+        filename=filename, file_path=file_path, source=source,
+        ttl_seconds=FILE_TTL_HOURS * 3600
+    )
 
 # Removed get_uploaded_file function - now using Gemini file IDs directly
 
@@ -114,7 +244,9 @@ async def upload_file(request: Request) -> JSONResponse:
     """
     HTTP endpoint for uploading SWMS documents.
     
-    Accepts multipart/form-data with a 'file' field.
+    Accepts multipart/form-data with a 'file' field, streamed to disk so memory
+    use per upload is constant. Files over SWMS_MAX_UPLOAD_MB are rejected with
+    413 as soon as the limit is crossed.
     Returns document_id for use with MCP tools.
     """
     try:
@@ -124,60 +256,51 @@ async def upload_file(request: Request) -> JSONResponse:
                 status_code=500
             )
         
-        # Parse multipart form data
-        form = await request.form()
-        uploaded_file = form.get("file")
-        
-        if not uploaded_file:
+        # Stream the file part to disk, hashing and size-checking it as it arrives
+        try:
+            upload = await receive_multipart_file(request, TEMP_STORAGE_DIR)
+        except UploadTooLarge as e:
             return JSONResponse(
-                {"error": "No file provided", "status": "error"}, 
-                status_code=400
+                {"error": str(e), "status": "error"}, 
+                status_code=413
             )
-        
-        # Read file data
-        file_data = await uploaded_file.read()
-        filename = uploaded_file.filename or "document"
-        
-        if len(file_data) == 0:
+        except UploadError as e:
             return JSONResponse(
-                {"error": "Empty file", "status": "error"}, 
+                {"error": str(e), "status": "error"}, 
                 status_code=400
             )
         
-        # Check file size (50MB limit)
-        if len(file_data) > 50 * 1024 * 1024:
+        # Upload to Gemini Files API through the shared ingestion pipeline
+        try:
+            ingested = await ingest_document(upload, "/upload")
+        except UnsupportedFileType as e:
             return JSONResponse(
-                {"error": "File too large (max 50MB)", "status": "error"}, 
-                status_code=413
+                {"error": str(e), "status": "error"}, 
+                status_code=415
+            )
+        except UploadError as e:
+            return JSONResponse(
+                {"error": str(e), "status": "error"}, 
+                status_code=400
             )
-        
-        # Save file locally
-        doc_id, file_path, mime_type = save_uploaded_file(file_data, filename)
-        
-        # Upload to Gemini Files API
-        try:
-            gemini_file = client.files.upload(file=file_path)
-            
-            return JSONResponse({
-                "status": "success",
-                "message": "File uploaded successfully",
-                "document_id": gemini_file.name,  # Return Gemini file ID directly
-                "filename": filename,
-                "mime_type": mime_type,
-                "file_size": len(file_data),
-                "gemini_file_uri": gemini_file.uri if hasattr(gemini_file, 'uri') else None
-            })
-            
         except Exception as e:
-            # Clean up local file if Gemini upload fails
-            try:
-                Path(file_path).unlink(missing_ok=True)
-            except:
-                pass
             return JSONResponse(
                 {"error": f"Failed to upload to Gemini: {str(e)}", "status": "error"}, 
                 status_code=500
             )
+        
+        gemini_file = ingested["gemini_file"]
+        return JSONResponse({
+            "status": "success",
+            "message": "File uploaded successfully",
+            "document_id": gemini_file.name,  # Return Gemini file ID directly
+            "deduplicated": ingested["deduplicated"],
+            "filename": upload.filename,
+            "mime_type": gemini_file.mime_type or upload.mime_type,
+            "file_size": upload.size,
+            "sha256": upload.sha256,
+            "gemini_file_uri": gemini_file.uri if hasattr(gemini_file, 'uri') else None
+        })
     
     except Exception as e:
         return JSONResponse(
@@ -187,51 +310,105 @@ async def upload_file(request: Request) -> JSONResponse:
 
 @mcp.custom_route("/health", methods=["GET"])
 async def health_check(request: Request) -> JSONResponse:
-    """Health check endpoint"""
+    """
+    Health check endpoint.
+    
+    Returns 503 with status "warming" until context warm-up has finished, so a
+    load balancer can hold traffic until the regulatory caches are hot.
+    """
+    # HTTP deployments may be probed before any MCP session starts the warm-up
+    start_context_warmup()
+    warmup = r2_context.get_warmup_status() if r2_context else None
+    ready = warmup is None or warmup["ready"]
+    
     return JSONResponse({
-        "status": "healthy",
+        "status": "healthy" if ready else "warming",
         "service": "swms-analysis-server",
         "upload_endpoint": "/upload",
         "gemini_api_configured": client is not None,
-        "active_uploads": len(uploaded_files),
-        "temp_storage_dir": str(TEMP_STORAGE_DIR)
-    })
+        "active_uploads": document_registry.count(),
+        "temp_storage_dir": str(TEMP_STORAGE_DIR),
+        "context_warmup": warmup
+    }, status_code=200 if ready else 503)
 
 @mcp.custom_route("/uploads", methods=["GET"])
 async def list_uploads(request: Request) -> JSONResponse:
-    """List current uploaded files (for debugging)"""
+    """
+    List current uploaded files (for debugging), most recent first.
+    
+    Paginate with ?limit=N (default 50, max 500) and ?offset=N.
+    """
     cleanup_expired_files()  # Clean up before listing
     
+    try:
+        limit = min(max(int(request.query_params.get("limit", 50)), 1), 500)
+        offset = max(int(request.query_params.get("offset", 0)), 0)
+    except ValueError:
+        return JSONResponse(
+            {"error": "limit and offset must be integers", "status": "error"}, 
+            status_code=400
+        )
+    
     files_info = {}
-    for doc_id, file_info in uploaded_files.items():
-        files_info[doc_id] = {
-            "filename": file_info.get("filename"),
-            "mime_type": file_info.get("mime_type"),
-            "file_size": file_info.get("file_size"),
-            "upload_time": file_info.get("upload_time"),
-            "expires_at": file_info.get("upload_time", 0) + (FILE_TTL_HOURS * 3600)
+    for row in document_registry.list(limit=limit, offset=offset):
+        files_info[row["document_id"]] = {
+            "filename": row["filename"],
+            "mime_type": row["mime_type"],
+            "file_size": row["size_bytes"],
+            "sha256": row["sha256"],
+            "source": row["source"],
+            "upload_time": row["uploaded_at"],
+            "expires_at": row["expires_at"],
+            "reuse_count": row["reuse_count"]
         }
     
+    total = document_registry.count()
     return JSONResponse({
         "status": "success",
-        "upload_count": len(files_info),
+        "upload_count": total,
+        "offset": offset,
+        "limit": limit,
+        "next_offset": offset + limit if offset + limit < total else None,
         "files": files_info
     })
 
-def convert_docx_to_pdf(docx_bytes: bytes) -> bytes:
+@mcp.custom_route("/regulatory/missing", methods=["GET"])
+async def list_missing_regulatory_documents(request: Request) -> JSONResponse:
+    """
+    List manifest entries that are missing from the regulatory corpus (for admins).
+    
+    Pass ?refresh=true to re-check every manifest entry against the storage backend first.
+    """
+    local_report = validate_manifest(REGULATORY_MANIFEST)
+    response = {
+        "status": "success",
+        "manifest_version": REGULATORY_MANIFEST.version,
+        "missing_locally": [
+            path for path, status in local_report["documents"].items() if status == "missing"
+        ]
+    }
+    
+    if r2_context:
+        if request.query_params.get("refresh", "").lower() in ("1", "true", "yes"):
+            response["backend_validation"] = await r2_context.validate_backend()
+        response["missing_in_r2"] = r2_context.get_missing_documents()
+    
+    return JSONResponse(response)
+
+def convert_docx_to_pdf(docx_path: Union[str, Path], pdf_path: Union[str, Path]):
     """
-    Convert DOCX bytes to PDF bytes using python-docx and reportlab.
+    Convert a DOCX file to a PDF file using python-docx and reportlab.
     This is a simplified conversion that preserves text and basic formatting.
+    Reads from and writes to disk, so the document is never held as bytes.
     """
     if not DOCX_CONVERSION_AVAILABLE:
         raise ImportError("DOCX conversion libraries not available")
     
     # Read DOCX document
-    doc = Document(io.BytesIO(docx_bytes))
+    doc = Document(str(docx_path))
     
-    # Create PDF in memory
-    pdf_buffer = io.BytesIO()
-    pdf = SimpleDocTemplate(pdf_buffer, pagesize=letter,
+    # Create PDF straight to the output file
+    pdf = SimpleDocTemplate(str(pdf_path), pagesize=letter,
                            rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
     
@@ -308,12 +485,117 @@ def convert_docx_to_pdf(docx_bytes: bytes) -> bytes:
     
     # Build PDF
     pdf.build(story)
+
+def upload_response(ingested: Dict[str, Any], message: str, **file_info) -> Dict[str, Any]:
+    """Upload tool response for an ingested document"""
+    gemini_file = ingested["gemini_file"]
+    response = {
+        "status": "success",
+        "message": message,
+        "document_id": gemini_file.name,  # Return Gemini's file ID directly
+        "deduplicated": ingested["deduplicated"],
+        "file_info": {
+            "name": gemini_file.display_name,
+            "mime_type": gemini_file.mime_type,
+            "uri": gemini_file.uri,
+            "size_bytes": ingested["size_bytes"],
+            "sha256": ingested["sha256"],
+            **file_info
+        }
+    }
+    if ingested["converted_from_docx"]:
+        response["conversion_info"] = {
+            "original_format": "DOCX",
+            "original_name": ingested["original_name"],
+            "converted_to": "PDF",
+            "note": "Document was automatically converted from DOCX to PDF for Gemini compatibility"
+        }
+    return response
+
+async def ingest_document(document: SpooledUpload, source: str, owned: bool = True) -> Dict[str, Any]:
+    """
+    Upload pipeline shared by every upload path: reuse, convert, upload, register.
     
-    # Get PDF bytes
-    pdf_bytes = pdf_buffer.getvalue()
-    pdf_buffer.close()
+    Re-uploads of the same bytes (keyed before any conversion) reuse the live
+    Gemini file. Otherwise a PDF is uploaded straight from its path, and a DOCX
+    is converted file-to-file in a worker thread and the PDF uploaded.
+    
+    Args:
+        document: Document on local disk, with its size and SHA-256
+        source: Where it came from (URL, path or upload route), for the registry
+        owned: True for the server's own spool files, which are kept until expiry
+               (or deleted when not needed); a caller's file is never moved or deleted
+        
+    Returns:
+        gemini_file, deduplicated, size_bytes, sha256, original_name, converted_from_docx
+        
+    Raises:
+        UnsupportedFileType: If a DOCX is not a Word package
+        UploadError: If a DOCX cannot be converted
+    """
+    ingested = {
+        "deduplicated": False,
+        "size_bytes": document.size,
+        "sha256": document.sha256,
+        "original_name": document.filename,
+        "converted_from_docx": False
+    }
+    async with document_registry.locked(document.sha256):
+        gemini_file = await document_registry.find(gateway, document.sha256)
+        if gemini_file is not None:
+            if owned:
+                document.discard()
+            # Report what a fresh upload would: the registered (post-conversion) size
+            # and whether these bytes needed converting
+            row = document_registry.get(gemini_file.name) or {}
+            return dict(
+                ingested,
+                gemini_file=gemini_file,
+                deduplicated=True,
+                size_bytes=row.get("size_bytes") or document.size,
+                converted_from_docx=document.mime_type == DOCX_MIME_TYPE
+            )
+        
+        upload_path, file_name, mime_type = document.path, document.filename, document.mime_type
+        local_copy = str(document.path) if owned else None
+        
+        # Convert DOCX to PDF if needed
+        if mime_type == DOCX_MIME_TYPE:
+            try:
+                await asyncio.to_thread(check_docx_package, document.path)
+            except UnsupportedFileType:
+                if owned:
+                    document.discard()
+                raise
+            if not DOCX_CONVERSION_AVAILABLE:
+                if owned:
+                    document.discard()
+                raise UploadError("DOCX files require conversion to PDF, but conversion libraries are not available")
+            upload_path = TEMP_STORAGE_DIR / f"{uuid.uuid4()}.pdf"
+            try:
+                await asyncio.to_thread(convert_docx_to_pdf, document.path, upload_path)
+            except Exception as e:
+                upload_path.unlink(missing_ok=True)
+                raise UploadError(f"Failed to convert DOCX to PDF: {str(e)}")
+            finally:
+                if owned:
+                    document.discard()
+            file_name = Path(file_name).stem + '.pdf'
+            mime_type = PDF_MIME_TYPE
+            local_copy = str(upload_path)
+            ingested.update(size_bytes=upload_path.stat().st_size, converted_from_docx=True)
+        
+        # Upload straight from the path; the local copy is kept for potential
+        # re-use and cleaned up by cleanup_expired_files() after TTL
+        try:
+            gemini_file = await gateway.upload(upload_path, mime_type, file_name)
+        except Exception:
+            if local_copy:
+                Path(local_copy).unlink(missing_ok=True)
+            raise
+        register_upload(document.sha256, gemini_file, ingested["size_bytes"], file_name, local_copy, source)
     
-    return pdf_bytes
+    return dict(ingested, gemini_file=gemini_file)
 
 @mcp.tool()
 async def upload_swms_document(
@@ -337,6 +619,7 @@ async def upload_swms_document(
         Dictionary with:
         - status: "success" or "error"
         - document_id: Gemini file ID (format: "files/abc123...") - use this with analysis tools
+        - deduplicated: True if these exact bytes were already uploaded and the existing document_id was reused
         - file_info: Details about the uploaded file
         - conversion_info: Present if DOCX was converted to PDF
         
@@ -361,83 +644,18 @@ async def upload_swms_document(
                 "message": f"Invalid base64 content: {str(e)}"
             }
         
-        # Auto-detect MIME type if not provided
-        converted_from_docx = False
-        original_file_name = file_name
-        
-        if not mime_type:
-            extension = Path(file_name).suffix.lower()
-            if extension == '.pdf':
-                mime_type = 'application/pdf'
-            elif extension in ['.docx', '.doc']:
-                mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Unsupported file format: {extension}. Only PDF and DOCX are supported."
-                }
-        
-        # Convert DOCX to PDF if needed
-        if mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document' or \
-           file_name.lower().endswith('.docx'):
-            if DOCX_CONVERSION_AVAILABLE:
-                try:
-                    # Convert DOCX to PDF
-                    file_bytes = convert_docx_to_pdf(file_bytes)
-                    # Update file name and mime type
-                    file_name = Path(file_name).stem + '.pdf'
-                    mime_type = 'application/pdf'
-                    converted_from_docx = True
-                except Exception as e:
-                    return {
-                        "status": "error",
-                        "message": f"Failed to convert DOCX to PDF: {str(e)}"
-                    }
-            else:
-                return {
-                    "status": "error",
-                    "message": "DOCX files require conversion to PDF, but conversion libraries are not available"
-                }
-        
-        # Create temporary file for upload
-        with tempfile.NamedTemporaryFile(suffix='.pdf' if converted_from_docx else Path(file_name).suffix, delete=False) as temp_file:
-            temp_file.write(file_bytes)
-            temp_path = temp_file.name
-        
         try:
-            # Upload file to Gemini
-            uploaded_file = client.files.upload(
-                file=temp_path,
-                config=types.UploadFileConfig(
-                    display_name=file_name,
-                    mime_type=mime_type
-                )
-            )
-            
-            response = {
-                "status": "success",
-                "message": f"Document {file_name} uploaded successfully",
-                "document_id": uploaded_file.name,
-                "file_info": {
-                    "name": uploaded_file.display_name,
-                    "mime_type": uploaded_file.mime_type,
-                    "uri": uploaded_file.uri,
-                    "size_bytes": len(file_bytes)
-                }
+            # Write the decoded bytes to disk once, detecting the type if not provided
+            document = spool_bytes(file_bytes, file_name, TEMP_STORAGE_DIR, mime_type)
+            del file_bytes  # Free the decoded copy before the upload
+            ingested = await ingest_document(document, "upload_swms_document")
+        except UploadError as e:
+            return {
+                "status": "error",
+                "message": str(e)
             }
-            
-            if converted_from_docx:
-                response["conversion_info"] = {
-                    "original_format": "DOCX",
-                    "original_name": original_file_name,
-                    "converted_to": "PDF",
-                    "note": "Document was automatically converted from DOCX to PDF for Gemini compatibility"
-                }
-            
-            return response
-        finally:
-            # Clean up temporary file
-            os.unlink(temp_path)
+        
+        return upload_response(ingested, f"Document {file_name} uploaded successfully")
             
     except Exception as e:
         return {
@@ -465,6 +683,7 @@ async def upload_swms_from_url(url: str) -> Dict[str, Any]:
         Dictionary with:
         - status: "success" or "error"
         - document_id: Gemini file ID (format: "files/abc123...") - use this with analysis tools
+        - deduplicated: True if these exact bytes were already uploaded and the existing document_id was reused
         - file_info: Details including source_url, size_bytes, mime_type
         - conversion_info: Present if DOCX was converted to PDF
         
@@ -476,7 +695,8 @@ async def upload_swms_from_url(url: str) -> Dict[str, Any]:
     Error cases:
         - Returns error if URL is not accessible (404, 403, etc.)
         - Returns error if file format is not supported
-        - Returns error if file is too large (>50MB)
+        - Returns error if file is too large (>50MB, or SWMS_MAX_UPLOAD_MB); the download
+          is aborted as soon as the limit is crossed
     """
     try:
         if not client:
@@ -485,109 +705,20 @@ async def upload_swms_from_url(url: str) -> Dict[str, Any]:
                 "message": "Gemini API key not configured"
             }
         
-        # Download file from URL
+        # Stream the download to disk over the shared pool, sniffing the type from
+        # the first chunk and enforcing the size limit as bytes arrive
         try:
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-        except requests.RequestException as e:
+            download = await download_to_spool(gateway.download_client, url, TEMP_STORAGE_DIR)
+            ingested = await ingest_document(download, url)
+        except UploadError as e:
             return {
                 "status": "error",
-                "message": f"Failed to download from URL: {str(e)}"
+                "message": str(e)
             }
         
-        # Determine file name and MIME type from URL and headers
-        file_name = url.split('/')[-1].split('?')[0]
-        if not file_name or '.' not in file_name:
-            file_name = "document.pdf"  # Default name
-        
-        converted_from_docx = False
-        original_file_name = file_name
-        file_bytes = response.content
-        
-        content_type = response.headers.get('content-type', '')
-        if 'pdf' in content_type:
-            mime_type = 'application/pdf'
-            if not file_name.endswith('.pdf'):
-                file_name = file_name.split('.')[0] + '.pdf'
-        elif 'wordprocessingml' in content_type or 'msword' in content_type:
-            mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            if not file_name.endswith('.docx'):
-                file_name = file_name.split('.')[0] + '.docx'
-        else:
-            # Try to detect from file extension
-            extension = Path(file_name).suffix.lower()
-            if extension == '.pdf':
-                mime_type = 'application/pdf'
-            elif extension in ['.docx', '.doc']:
-                mime_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Could not determine file type from URL. Ensure it's a PDF or DOCX file."
-                }
-        
-        # Convert DOCX to PDF if needed
-        if mime_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
-            if DOCX_CONVERSION_AVAILABLE:
-                try:
-                    # Convert DOCX to PDF
-                    file_bytes = convert_docx_to_pdf(file_bytes)
-                    # Update file name and mime type
-                    file_name = Path(file_name).stem + '.pdf'
-                    mime_type = 'application/pdf'
-                    converted_from_docx = True
-                except Exception as e:
-                    return {
-                        "status": "error",
-                        "message": f"Failed to convert DOCX to PDF: {str(e)}"
-                    }
-            else:
-                return {
-                    "status": "error",
-                    "message": "DOCX files require conversion to PDF, but conversion libraries are not available"
-                }
-        
-        # Create temporary file for upload
-        with tempfile.NamedTemporaryFile(suffix='.pdf' if converted_from_docx else Path(file_name).suffix, delete=False) as temp_file:
-            temp_file.write(file_bytes)
-            temp_path = temp_file.name
-        
-        try:
-            # Upload file to Gemini
-            uploaded_file = client.files.upload(
-                file=temp_path,
-                config=types.UploadFileConfig(
-                    display_name=file_name,
-                    mime_type=mime_type
-                )
-            )
-            
-            response_data = {
-                "status": "success",
-                "message": f"Document {file_name} uploaded successfully from URL",
-                "document_id": uploaded_file.name,  # Return Gemini's file ID directly
-                "file_info": {
-                    "name": uploaded_file.display_name,
-                    "mime_type": uploaded_file.mime_type,
-                    "uri": uploaded_file.uri,
-                    "size_bytes": len(file_bytes),
-                    "source_url": url
-                }
-            }
-            
-            if converted_from_docx:
-                response_data["conversion_info"] = {
-                    "original_format": "DOCX",
-                    "original_name": original_file_name,
-                    "converted_to": "PDF",
-                    "note": "Document was automatically converted from DOCX to PDF for Gemini compatibility"
-                }
-            
-            return response_data
-        finally:
-            # Don't delete temp file - it's stored in uploaded_files for potential re-use
-            # It will be cleaned up by cleanup_expired_files() after TTL
-            pass
+        return upload_response(
+            ingested, f"Document {download.filename} uploaded successfully from URL", source_url=url
+        )
             
     except Exception as e:
         return {
@@ -615,6 +746,7 @@ async def upload_swms_from_file(file_path: str) -> Dict[str, Any]:
         Dictionary with:
         - status: "success" or "error"
         - document_id: Gemini file ID (format: "files/abc123...") - use this with analysis tools
+        - deduplicated: True if these exact bytes were already uploaded and the existing document_id was reused
         - file_info: Details including source_path, size_bytes, mime_type
         - conversion_info: Present if DOCX was converted to PDF
         
@@ -636,28 +768,31 @@ async def upload_swms_from_file(file_path: str) -> Dict[str, Any]:
                 "message": f"File not found: {file_path}"
             }
         
-        # Read file and encode to base64
+        if not client:
+            return {
+                "status": "error",
+                "message": "Gemini API key not configured"
+            }
+        
+        # Hash and type-check the file in place; it is uploaded straight from its path
+        # (or converted file-to-file), never read into memory or copied
         try:
-            with open(file_path, 'rb') as f:
-                file_bytes = f.read()
-            file_content = base64.b64encode(file_bytes).decode('utf-8')
-        except Exception as e:
+            document = await asyncio.to_thread(inspect_local_file, Path(file_path))
+            ingested = await ingest_document(document, os.path.abspath(file_path), owned=False)
+        except UploadError as e:
+            return {
+                "status": "error",
+                "message": str(e)
+            }
+        except OSError as e:
             return {
                 "status": "error",
                 "message": f"Failed to read file: {str(e)}"
             }
         
-        # Get file name from path
-        file_name = os.path.basename(file_path)
-        
-        # Call existing upload_swms_document function
-        result = await upload_swms_document(file_content, file_name)
-        
-        # Add source file path to response
-        if result.get("status") == "success":
-            result["file_info"]["source_path"] = file_path
-        
-        return result
+        return upload_response(
+            ingested, f"Document {document.filename} uploaded successfully", source_path=file_path
+        )
         
     except Exception as e:
         return {
@@ -665,84 +800,62 @@ async def upload_swms_from_file(file_path: str) -> Dict[str, Any]:
             "message": f"Failed to upload document from file: {str(e)}"
         }
 
-@mcp.tool()
-async def analyze_swms_compliance(
-    document_id: str,
-    jurisdiction: Optional[str] = "nsw"
+def assessment_area_scores(assessment: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Numeric area scores (with justifications) from a combined assessment"""
+    detailed = assessment.get("detailed_analysis", {})
+    return {
+        area: {
+            "score": detailed[area].get("score"),
+            "justification": detailed[area].get("justification") or detailed[area].get("comments", "")
+        }
+        for area in SCORE_AREAS
+        if isinstance(detailed.get(area), dict) and isinstance(detailed[area].get("score"), (int, float))
+    }
+
+def record_area_scores(gemini_file: Any, jurisdiction: Optional[str], assessment: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a successful assessment's area scores for rescore, and return the assessment"""
+    if assessment.get("status") == "success" and "parse_error" not in assessment:
+        scores = assessment_area_scores(assessment)
+        if scores:
+            area_scores.put(
+                gemini_file.name,
+                {area: data["score"] for area, data in scores.items()},
+                content_hash=document_content_hash(gemini_file),
+                jurisdiction=jurisdiction
+            )
+    return assessment
+
+async def get_swms_assessment(
+    gemini_file: Any,
+    jurisdiction: Optional[str],
+    cache: str = "prefer"
 ) -> Dict[str, Any]:
     """
-    Analyze a SWMS document for WHS compliance using Gemini API.
-    
-    Prerequisites: Document must be uploaded first using one of:
-    - upload_swms_from_url (recommended)
-    - upload_swms_document
-    - upload_swms_from_file
+    Combined compliance assessment of an uploaded SWMS.
     
-    Args:
-        document_id: Gemini file ID from upload tools (format: "files/abc123...")
-                     This is returned as 'document_id' from any upload tool
-        jurisdiction: Australian state/territory code for compliance checking
-                      Options: "nsw", "vic", "qld", "wa", "sa", "tas", "act", "nt", "national"
-                      Default: "nsw"
-                      Note: "vic" uses OHS terminology, others use WHS
-        
-    Returns:
-        Comprehensive compliance report with:
-        - project_details: Extracted project information
-        - overall_assessment: "Compliant", "Partially Compliant", or "Non-Compliant"
-        - summary: High-level compliance summary
-        - detailed_analysis: Six key areas (document_control, hrcw_identification, 
-                            hazard_identification, control_measures, monitoring_review, consultation)
-        - urgent_actions: Critical items to address before work begins
-        - recommendations: Suggested improvements
-        
-    Example workflow:
-        1. Upload: upload_result = upload_swms_from_url(url="https://example.com/swms.pdf")
-        2. Analyze: report = analyze_swms_compliance(
-                        document_id=upload_result["document_id"],
-                        jurisdiction="nsw"
-                    )
-        3. Check status: if report["overall_assessment"] == "Non-Compliant":
-                            review_urgent_actions(report["urgent_actions"])
+    One model call returns both the qualitative status and a 0-100 score for
+    each compliance area. The result is cached by SWMS content, so
+    analyze_swms_compliance and get_compliance_score (with any weighting)
+    share a single call.
     """
-    try:
-        if not client:
-            return {
-                "status": "error",
-                "message": "Gemini API key not configured"
-            }
-        
-        # Get the Gemini file object directly
+    # Get jurisdiction-specific information if R2 context manager is available
+    jurisdiction_info = {}
+    if r2_context and jurisdiction:
         try:
-            gemini_file = client.files.get(name=document_id)
+            jurisdiction_info = r2_context.get_jurisdiction_context(jurisdiction)
         except Exception as e:
-            return {
-                "status": "error",
-                "message": f"Document not found or unable to access: {document_id}. Error: {str(e)}"
-            }
-        
-        # Get jurisdiction-specific context if R2 context manager is available
-        context_files = []
-        jurisdiction_info = {}
-        if r2_context and jurisdiction:
-            try:
-                # Get regulatory document file IDs from R2
-                context_files = r2_context.get_context_files(jurisdiction)
-                # Get jurisdiction-specific information
-                jurisdiction_info = r2_context.get_jurisdiction_context(jurisdiction)
-            except Exception as e:
-                print(f"Warning: Could not load R2 context: {e}")
-        
-        # Build jurisdiction-aware prompt
-        jurisdiction_upper = jurisdiction.upper() if jurisdiction else "NSW"
-        legislation = jurisdiction_info.get("legislation", "Work Health and Safety Regulation 2017")
-        regulator = jurisdiction_info.get("regulatory_body", "SafeWork NSW")
-        
-        # Adjust terminology for Victoria
-        terminology = "WHS" if jurisdiction != "vic" else "OHS"
-        
-        # SWMS Assessment Prompt with jurisdiction awareness
-        assessment_prompt = f"""
+            print(f"Warning: Could not load R2 context: {e}")
+    
+    # Build jurisdiction-aware prompt
+    jurisdiction_upper = jurisdiction.upper() if jurisdiction else "NSW"
+    legislation = jurisdiction_info.get("legislation", "Work Health and Safety Regulation 2017")
+    regulator = jurisdiction_info.get("regulatory_body", "SafeWork NSW")
+    
+    # Adjust terminology for Victoria
+    terminology = "WHS" if jurisdiction != "vic" else "OHS"
+    
+    # SWMS Assessment Prompt with jurisdiction awareness
+    assessment_prompt = f"""
 ## System Prompt for Assessing Safe Work Method Statements (SWMS) in {jurisdiction_upper} Construction
 
 **Objective:** Analyze the provided Safe Work Method Statement (SWMS) for completeness and compliance with {legislation}. Generate a detailed compliance report.
@@ -784,6 +897,12 @@ You are an AI assistant with expertise in {jurisdiction_upper} Work Health and S
 - Evidence of worker consultation
 - Sign-off sheets or consultation records
 
+**Scoring:** Also give each area a numerical score (0-100):
+- 0-25: Non-compliant (critical elements missing)
+- 26-50: Partially compliant (significant gaps)
+- 51-75: Mostly compliant (minor improvements needed)
+- 76-100: Fully compliant (meets or exceeds requirements)
+
 **Output Format Required:**
 
 Return a JSON object with this exact structure:
@@ -801,27 +920,39 @@ Return a JSON object with this exact structure:
   "detailed_analysis": {{
     "document_control": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }},
     "hrcw_identification": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }},
     "hazard_identification": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }},
     "control_measures": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }},
     "monitoring_review": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }},
     "consultation": {{
       "status": "Compliant|Partially Compliant|Non-Compliant",
-      "comments": "[Specific findings and recommendations]"
+      "comments": "[Specific findings and recommendations]",
+      "score": [0-100],
+      "justification": "[Brief reason for score]"
     }}
   }},
   "urgent_actions": [
@@ -834,60 +965,127 @@ Return a JSON object with this exact structure:
 
 Analyze the attached SWMS document thoroughly and provide the assessment in the exact JSON format above.
 """
-        
-        # Build contents list with prompt and document
-        contents = [assessment_prompt]
-        
-        # Add context files if available
-        if context_files:
-            for file_id in context_files:
-                try:
-                    context_file = client.files.get(name=file_id)
-                    contents.append(
-                        types.Part.from_uri(
-                            file_uri=context_file.uri,
-                            mime_type=context_file.mime_type
-                        )
-                    )
-                except Exception as e:
-                    print(f"Warning: Could not add context file {file_id}: {e}")
-        
-        # Add the main SWMS document to analyze
-        contents.append(gemini_file)
-        
-        # Generate analysis using Gemini model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=contents
-        )
-        
-        # Parse the JSON response
-        try:
-            # Extract JSON from response text (handle potential markdown formatting)
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3].strip()
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3].strip()
-            
-            analysis_result = json.loads(response_text)
-            
-            # Ensure required structure
-            if "status" not in analysis_result:
-                analysis_result["status"] = "success"
-                
-            return analysis_result
-            
-        except json.JSONDecodeError as e:
-            # Fallback if JSON parsing fails
+    
+    # Room to leave in the token budget for the SWMS itself
+    reserved_tokens = estimate_file_tokens(
+        gemini_file.size_bytes or 0,
+        gemini_file.mime_type or "application/pdf"
+    )
+    
+    # Serve repeated analyses of the same SWMS content (and regulatory context) from the result cache
+    cache_key = result_cache.make_key(
+        document_content_hash(gemini_file), "swms_assessment",
+        {
+            "jurisdiction": jurisdiction,
+            "context": await regulatory_context_fingerprint(jurisdiction, reserved_tokens)
+        },
+        assessment_prompt, 'gemini-2.5-flash', REGULATORY_MANIFEST.version
+    )
+    cached_result = cache_lookup(cache, cache_key)
+    if cached_result:
+        return record_area_scores(gemini_file, jurisdiction, cached_result)
+    
+    # Build contents with the prompt and regulatory documents (or retrieved clause text)
+    contents, cached_content, regulatory_context = await build_regulatory_contents(
+        jurisdiction, assessment_prompt, 'gemini-2.5-flash', reserved_tokens
+    )
+    
+    # Add the main SWMS document to analyze
+    contents.append(gemini_file)
+    
+    # Generate schema-constrained analysis using Gemini model
+    try:
+        analysis_result = await generate_structured(
+            gateway, 'gemini-2.5-flash', contents, SCORED_COMPLIANCE_REPORT_SCHEMA, cached_content
+        )
+    except StructuredOutputError as e:
+        # Fallback if the response is still invalid after a repair attempt
+        return {
+            "status": "success",
+            "overall_assessment": "Analysis Completed",
+            "summary": "Document analyzed but response format needs adjustment",
+            "raw_response": e.raw_text[:2000],  # Truncate for safety
+            "parse_error": str(e)
+        }
+
+    # Ensure required structure
+    if "status" not in analysis_result:
+        analysis_result["status"] = "success"
+    if regulatory_context:
+        analysis_result["regulatory_context"] = regulatory_context
+
+    return record_area_scores(gemini_file, jurisdiction, cache_store(cache_key, analysis_result))
+    
+@mcp.tool()
+async def analyze_swms_compliance(
+    document_id: str,
+    jurisdiction: Optional[str] = "nsw",
+    cache: str = "prefer"
+) -> Dict[str, Any]:
+    """
+    Analyze a SWMS document for WHS compliance using Gemini API.
+    
+    Prerequisites: Document must be uploaded first using one of:
+    - upload_swms_from_url (recommended)
+    - upload_swms_document
+    - upload_swms_from_file
+    
+    Args:
+        document_id: Gemini file ID from upload tools (format: "files/abc123...")
+                     This is returned as 'document_id' from any upload tool
+        jurisdiction: Australian state/territory code for compliance checking
+                      Options: "nsw", "vic", "qld", "wa", "sa", "tas", "act", "nt", "national"
+                      Default: "nsw"
+                      Note: "vic" uses OHS terminology, others use WHS
+        cache: Result cache mode (results are keyed by document content, not document_id)
+               "prefer" - return a cached result when available, otherwise analyze (default)
+               "bypass" - always analyze, then refresh the cached result
+               "only" - return a cached result or an error, never calling the model
+        
+    Returns:
+        Comprehensive compliance report with:
+        - project_details: Extracted project information
+        - overall_assessment: "Compliant", "Partially Compliant", or "Non-Compliant"
+        - summary: High-level compliance summary
+        - detailed_analysis: Six key areas (document_control, hrcw_identification, 
+                            hazard_identification, control_measures, monitoring_review, consultation)
+        - urgent_actions: Critical items to address before work begins
+        - recommendations: Suggested improvements
+        
+    Example workflow:
+        1. Upload: upload_result = upload_swms_from_url(url="https://example.com/swms.pdf")
+        2. Analyze: report = analyze_swms_compliance(
+                        document_id=upload_result["document_id"],
+                        jurisdiction="nsw"
+                    )
+        3. Check status: if report["overall_assessment"] == "Non-Compliant":
+                            review_urgent_actions(report["urgent_actions"])
+    """
+    try:
+        if not client:
             return {
-                "status": "success",
-                "overall_assessment": "Analysis Completed",
-                "summary": "Document analyzed but response format needs adjustment",
-                "raw_response": response.text[:2000],  # Truncate for safety
-                "parse_error": str(e)
+                "status": "error",
+                "message": "Gemini API key not configured"
+            }
+
+        if cache not in CACHE_MODES:
+            return {
+                "status": "error",
+                "message": f"Invalid cache mode: {cache}. Valid options: {list(CACHE_MODES)}"
+            }
+        
+        # Get the Gemini file object directly
+        try:
+            gemini_file = await gateway.get_file(document_id)
+        except Exception as e:
+            return {
+                "status": "error",
+                "message": f"Document not found or unable to access: {document_id}. Error: {str(e)}"
             }
         
+        # Served from the combined assessment shared with get_compliance_score
+        return await get_swms_assessment(gemini_file, jurisdiction, cache)
+        
     except Exception as e:
         return {
             "status": "error",
@@ -1012,38 +1210,36 @@ DOCUMENT NAME: """ + document_name + """
 DOCUMENT CONTENT:
 """ + document_text
         
-        # Generate analysis using Gemini model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=assessment_prompt
-        )
+        # In retrieval mode, prepend the regulatory clauses most relevant to this SWMS text
+        contents = [assessment_prompt]
+        if r2_context and r2_context.context_mode == "retrieval":
+            try:
+                clauses = await r2_context.get_context_clauses(jurisdiction or "nsw", document_text)
+                if clauses:
+                    contents.insert(0, clauses)
+            except Exception as e:
+                print(f"Warning: Could not retrieve regulatory clauses: {e}")
         
-        # Parse the JSON response
+        # Generate schema-constrained analysis using Gemini model
         try:
-            # Extract JSON from response text (handle potential markdown formatting)
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3].strip()
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3].strip()
-            
-            analysis_result = json.loads(response_text)
-            
-            # Ensure required structure
-            if "status" not in analysis_result:
-                analysis_result["status"] = "success"
-                
-            return analysis_result
-            
-        except json.JSONDecodeError as e:
-            # Fallback if JSON parsing fails
+            analysis_result = await generate_structured(
+                gateway, 'gemini-2.5-flash', contents, COMPLIANCE_REPORT_SCHEMA
+            )
+        except StructuredOutputError as e:
+            # Fallback if the response is still invalid after a repair attempt
             return {
                 "status": "success",
                 "overall_assessment": "Analysis Completed",
                 "summary": "Document analyzed but response format needs adjustment",
-                "raw_response": response.text[:2000],  # Truncate for safety
+                "raw_response": e.raw_text[:2000],  # Truncate for safety
                 "parse_error": str(e)
             }
+
+        # Ensure required structure
+        if "status" not in analysis_result:
+            analysis_result["status"] = "success"
+
+        return analysis_result
         
     except Exception as e:
         return {
@@ -1077,7 +1273,7 @@ async def analyze_swms_custom(
         
         # Get the Gemini file object directly
         try:
-            gemini_file = client.files.get(name=document_id)
+            gemini_file = await gateway.get_file(document_id)
         except Exception as e:
             return {
                 "status": "error",
@@ -1095,46 +1291,42 @@ async def analyze_swms_custom(
         
         full_prompt = analysis_prompt + format_instructions
         
-        # Generate analysis using Gemini model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                full_prompt,
-                gemini_file
-            ]
-        )
-        
         # Handle response based on expected format
         if output_format == "json":
+            # Custom prompts have no fixed schema, so request free-form JSON
             try:
-                # Try to parse as JSON
-                response_text = response.text.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text[7:-3].strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text[3:-3].strip()
-                
-                result = json.loads(response_text)
+                result = await generate_structured(
+                    gateway, 'gemini-2.5-flash', [full_prompt, gemini_file]
+                )
                 return {
                     "status": "success",
                     "output_format": "json",
                     "result": result
                 }
-            except json.JSONDecodeError:
-                # Fall back to text if JSON parsing fails
+            except StructuredOutputError as e:
+                # Fall back to text if the response is still not JSON after a repair attempt
                 return {
                     "status": "success",
                     "output_format": "text",
-                    "result": response.text,
+                    "result": e.raw_text,
                     "note": "JSON parsing failed, returning as text"
                 }
-        else:
-            # Return as text for other formats
-            return {
-                "status": "success",
-                "output_format": output_format,
-                "result": response.text
-            }
+
+        # Generate analysis using Gemini model
+        response = await gateway.generate(
+            model='gemini-2.5-flash',
+            contents=[
+                full_prompt,
+                gemini_file
+            ]
+        )
+
+        # Return as text for other formats
+        return {
+            "status": "success",
+            "output_format": output_format,
+            "result": response.text
+        }
         
     except Exception as e:
         return {
@@ -1146,7 +1338,9 @@ async def analyze_swms_custom(
 async def get_compliance_score(
     document_id: str,
     weighted: bool = True,
-    jurisdiction: Optional[str] = "nsw"
+    jurisdiction: Optional[str] = "nsw",
+    cache: str = "prefer",
+    profile: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Calculate numerical compliance scores for a SWMS document.
@@ -1168,14 +1362,22 @@ async def get_compliance_score(
                   - Consultation: 10%
                   If False, all areas weighted equally (16.67% each)
                   Default: True
+        profile: Named weight profile to use instead of `weighted` ("default", "equal",
+                 "safety_critical", or one from SWMS_WEIGHT_PROFILES). See also rescore.
+        cache: Result cache mode (results are keyed by document content, not document_id)
+               "prefer" - return a cached result when available, otherwise analyze (default)
+               "bypass" - always analyze, then refresh the cached result
+               "only" - return a cached result or an error, never calling the model
         
     Returns:
         Score report with:
         - overall_score: 0-100 percentage score
         - weighted: Whether weighting was applied
         - area_scores: Individual scores and justifications for each compliance area
+        - profile: The weight profile applied
         - weights_used: The weightings applied (if weighted=True)
-        - compliance_level: "Fully Compliant" (85+), "Partially Compliant" (60-84), "Non-Compliant" (<60)
+        - compliance_level: "Fully Compliant" (76+), "Mostly Compliant" (51-75),
+                            "Partially Compliant" (26-50), "Non-Compliant" (<26)
         
     Example usage:
         score = get_compliance_score(
@@ -1195,117 +1397,59 @@ async def get_compliance_score(
                 "status": "error",
                 "message": "Gemini API key not configured"
             }
+
+        if cache not in CACHE_MODES:
+            return {
+                "status": "error",
+                "message": f"Invalid cache mode: {cache}. Valid options: {list(CACHE_MODES)}"
+            }
         
         # Get the Gemini file object directly
         try:
-            gemini_file = client.files.get(name=document_id)
+            gemini_file = await gateway.get_file(document_id)
         except Exception as e:
             return {
                 "status": "error",
                 "message": f"Document not found or unable to access: {document_id}. Error: {str(e)}"
             }
         
-        # Scoring prompt
-        scoring_prompt = """
-Analyze this SWMS document and provide numerical compliance scores (0-100) for NSW WHS compliance.
-
-Score each area based on:
-- 0-25: Non-compliant (critical elements missing)
-- 26-50: Partially compliant (significant gaps)
-- 51-75: Mostly compliant (minor improvements needed)
-- 76-100: Fully compliant (meets or exceeds requirements)
-
-Return a JSON object with this exact structure:
-{
-  "scores": {
-    "document_control": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }},
-    "hrcw_identification": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }},
-    "hazard_identification": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }},
-    "control_measures": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }},
-    "monitoring_review": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }},
-    "consultation": {{
-      "score": [0-100],
-      "justification": "[Brief reason for score]"
-    }
-  }
-}
-"""
-        
-        # Generate analysis using Gemini model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                scoring_prompt,
-                gemini_file
-            ]
-        )
-        
-        # Parse the JSON response
-        try:
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3].strip()
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3].strip()
-            
-            result = json.loads(response_text)
-            scores = result.get("scores", {})
-            
-            # Calculate overall score
-            if weighted:
-                # Weighted importance (total = 100%)
-                weights = {
-                    "document_control": 0.10,
-                    "hrcw_identification": 0.25,  # Critical for safety
-                    "hazard_identification": 0.20,
-                    "control_measures": 0.25,  # Critical for safety
-                    "monitoring_review": 0.10,
-                    "consultation": 0.10
-                }
-            else:
-                # Equal weighting
-                weights = {k: 1/6 for k in scores.keys()}
-            
-            overall_score = 0
-            for area, data in scores.items():
-                if isinstance(data, dict) and "score" in data:
-                    overall_score += data["score"] * weights.get(area, 0)
-            
+        # Scores come from the combined assessment shared with analyze_swms_compliance
+        assessment = await get_swms_assessment(gemini_file, jurisdiction, cache)
+        if assessment.get("status") != "success":
+            return assessment
+        if "parse_error" in assessment:
             return {
-                "status": "success",
-                "overall_score": round(overall_score, 1),
-                "weighted": weighted,
-                "area_scores": scores,
-                "weights_used": weights if weighted else "equal",
-                "compliance_level": (
-                    "Non-Compliant" if overall_score < 26 else
-                    "Partially Compliant" if overall_score < 51 else
-                    "Mostly Compliant" if overall_score < 76 else
-                    "Fully Compliant"
-                )
+                "status": "error",
+                "message": f"Failed to parse scoring response: {assessment['parse_error']}",
+                "raw_response": assessment.get("raw_response", "")[:1000]
             }
-            
-        except (json.JSONDecodeError, KeyError) as e:
+        
+        scores = assessment_area_scores(assessment)
+        
+        # Calculate overall score with the weight profile (missing areas score 0)
+        profile_name = profile or ("default" if weighted else "equal")
+        profiles = load_weight_profiles()
+        if profile_name not in profiles:
             return {
                 "status": "error",
-                "message": f"Failed to parse scoring response: {str(e)}",
-                "raw_response": response.text[:1000]
+                "message": f"Unknown weight profile: {profile_name}. Valid options: {list(profiles.keys())}"
             }
+        weights = normalize_weights(profiles[profile_name])
+        overall_score = weighted_scores(
+            [[scores[area]["score"] if area in scores else 0 for area in SCORE_AREAS]], weights
+        )[0]
+        
+        return {
+            "status": "success",
+            "overall_score": round(overall_score, 1),
+            "weighted": profile_name != "equal",
+            "area_scores": scores,
+            "profile": profile_name,
+            "weights_used": weights if profile_name != "equal" else "equal",
+            "compliance_level": compliance_level(overall_score),
+            "regulatory_context": assessment.get("regulatory_context"),
+            "cache": assessment.get("cache")
+        }
         
     except Exception as e:
         return {
@@ -1313,34 +1457,164 @@ Return a JSON object with this exact structure:
             "message": f"Failed to calculate compliance score: {str(e)}"
         }
 
+@mcp.tool()
+async def rescore(
+    document_ids: Optional[List[str]] = None,
+    profile: str = "default",
+    weights: Optional[Dict[str, float]] = None,
+    jurisdiction: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Recompute overall compliance scores from stored area scores, without calling the model.
+    
+    Prerequisites: Each document must have been assessed once with analyze_swms_compliance
+    or get_compliance_score, which store its six area scores.
+    
+    Use this to apply a client- or jurisdiction-specific weighting across many documents,
+    e.g. for portfolio dashboards.
+    
+    Args:
+        document_ids: Gemini file IDs to score (format: "files/abc123...").
+                      Default: every document with stored scores
+        profile: Named weight profile: "default", "equal", "safety_critical", or one
+                 defined in the SWMS_WEIGHT_PROFILES file. Ignored if weights is given.
+                 Default: "default"
+        weights: Custom weights by area, e.g. {"hrcw_identification": 3, "control_measures": 3,
+                 "hazard_identification": 2, "document_control": 1, "monitoring_review": 1,
+                 "consultation": 1}. Omitted areas weigh 0; weights are scaled to sum to 1.
+        jurisdiction: Only score documents assessed for this jurisdiction (optional)
+        
+    Returns:
+        Re-scoring report with:
+        - profile: The profile name, or "custom"
+        - weights_used: The normalized weights applied
+        - results: {document_id: {"overall_score", "compliance_level"}}
+        - missing: Requested document IDs with no stored scores
+        - summary: Documents scored, mean score and count per compliance level
+        
+    Example usage:
+        report = rescore(profile="safety_critical", jurisdiction="qld")
+        for document_id, result in report["results"].items():
+            if result["compliance_level"] == "Non-Compliant":
+                flag_for_review(document_id)
+    """
+    try:
+        started = time.perf_counter()
+        if weights:
+            profile_name = "custom"
+            normalized = normalize_weights(weights)
+        else:
+            profiles = load_weight_profiles()
+            if profile not in profiles:
+                return {
+                    "status": "error",
+                    "message": f"Unknown weight profile: {profile}. Valid options: {list(profiles.keys())}"
+                }
+            profile_name = profile
+            normalized = normalize_weights(profiles[profile])
+        
+        report = area_scores.rescore(normalized, document_ids, jurisdiction)
+        
+        return {
+            "status": "success",
+            "profile": profile_name,
+            "weights_used": {area: round(weight, 4) for area, weight in normalized.items()},
+            **report,
+            "vectorised": NUMPY_AVAILABLE,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        
+    except ValueError as e:
+        return {
+            "status": "error",
+            "message": str(e)
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to rescore documents: {str(e)}"
+        }
+
+# Quick check prompts by check type; quick_check_swms merges the requested ones into one pass
+QUICK_CHECK_PROMPTS = {
+    "hrcw": """
+Check this SWMS for High-Risk Construction Work (HRCW) identification.
+Look for activities from the 18 HRCW categories in NSW WHS Regulation 2017.
+Return JSON: {"hrcw_found": [list of HRCW activities], "properly_identified": true/false, "missing": [any likely HRCW not explicitly identified]}
+""",
+    "ppe": """
+Check PPE requirements in this SWMS.
+Return JSON: {"ppe_specified": true/false, "ppe_items": [list of PPE required], "task_specific_ppe": [{"task": "task name", "ppe_items": [PPE for that task]}], "gaps": [missing PPE]}
+""",
+    "emergency": """
+Check emergency procedures in this SWMS.
+Return JSON: {"emergency_procedures": true/false, "contact_numbers": true/false, "evacuation_plan": true/false, "first_aid": true/false, "issues": [list of missing items]}
+""",
+    "signatures": """
+Check for worker consultation and sign-off provisions.
+Return JSON: {"sign_off_section": true/false, "consultation_evidence": true/false, "responsible_person": "name or not specified", "issues": [list of problems]}
+""",
+    "hierarchy": """
+Check if control measures follow the hierarchy of controls.
+Return JSON: {"hierarchy_followed": true/false, "elimination": [examples], "substitution": [examples], "engineering": [examples], "administrative": [examples], "ppe": [examples], "issues": [problems with hierarchy application]}
+""",
+    "hazards": """
+Quick check of hazard identification completeness.
+Return JSON: {"hazards_identified": [list of hazards], "site_specific": true/false, "generic_only": true/false, "missing_common": [likely missing hazards], "count": number}
+"""
+}
+
+
+def build_quick_check_prompt(check_types: List[str]) -> str:
+    """Merge the prompts for several check types into one request keyed by check type"""
+    sections = [f'## Check "{check_type}"\n{QUICK_CHECK_PROMPTS[check_type].strip()}' for check_type in check_types]
+    keys = ", ".join(f'"{check_type}": {{...}}' for check_type in check_types)
+    return (
+        "Perform the following quick checks on this SWMS document in a single pass.\n"
+        "Each check describes the JSON object it returns.\n\n"
+        + "\n\n".join(sections)
+        + f"\n\nReturn ONLY valid JSON, no markdown formatting or explanations, "
+        f"with one object per check: {{{keys}}}"
+    )
+
 @mcp.tool()
 async def quick_check_swms(
     document_id: str,
-    check_type: str
+    check_type: Union[str, List[str]],
+    cache: str = "prefer"
 ) -> Dict[str, Any]:
     """
-    Perform a quick focused check on specific aspects of a SWMS document.
+    Perform quick focused checks on specific aspects of a SWMS document.
     
     Prerequisites: Document must be uploaded first using upload_swms_from_url or similar.
     
     Faster than full compliance analysis - use this for quick validations or specific concerns.
+    Several checks (or "all") are answered together in a single model call.
     
     Args:
         document_id: Gemini file ID from upload tools (format: "files/abc123...")
-        check_type: Specific aspect to check. Must be one of:
+        check_type: Aspect to check, a list of aspects, or "all". Each must be one of:
                    - "hrcw": High-Risk Construction Work identification per Schedule 1
                    - "ppe": Personal Protective Equipment requirements and specifications
                    - "emergency": Emergency procedures and contact information
                    - "signatures": Worker consultation and sign-off sections
                    - "hierarchy": Hierarchy of controls implementation (Elimination→PPE)
                    - "hazards": Quick scan of identified hazards and risk ratings
+        cache: Result cache mode (results are keyed by document content, not document_id)
+               "prefer" - return a cached result when available, otherwise analyze (default)
+               "bypass" - always analyze, then refresh the cached result
+               "only" - return a cached result or an error, never calling the model
         
     Returns:
-        Focused results with:
+        For a single check type:
         - status: "success" or "error"
         - check_type: The type of check performed
         - result: Specific findings for the check type
         - quick_summary: Brief summary of findings
+        For a list or "all":
+        - status: "success" or "error"
+        - check_types: The checks performed
+        - results: {check_type: {"result": findings, "quick_summary": summary}}
         
     Example usage:
         # Check if HRCW is properly identified
@@ -1350,6 +1624,11 @@ async def quick_check_swms(
         )
         if not hrcw_check["result"]["properly_identified"]:
             alert_supervisor(hrcw_check["result"]["missing"])
+        
+        # Run every check in one pass
+        checks = quick_check_swms(document_id="files/abc123", check_type="all")
+        for name, check in checks["results"].items():
+            print(name, check["quick_summary"])
     """
     try:
         if not client:
@@ -1357,90 +1636,73 @@ async def quick_check_swms(
                 "status": "error",
                 "message": "Gemini API key not configured"
             }
-        
-        # Get the Gemini file object directly
-        try:
-            gemini_file = client.files.get(name=document_id)
-        except Exception as e:
+
+        if cache not in CACHE_MODES:
             return {
                 "status": "error",
-                "message": f"Document not found or unable to access: {document_id}. Error: {str(e)}"
+                "message": f"Invalid cache mode: {cache}. Valid options: {list(CACHE_MODES)}"
             }
         
-        # Define check-specific prompts
-        check_prompts = {
-            "hrcw": """
-Check this SWMS for High-Risk Construction Work (HRCW) identification.
-Look for activities from the 18 HRCW categories in NSW WHS Regulation 2017.
-Return JSON: {"hrcw_found": [list of HRCW activities], "properly_identified": true/false, "missing": [any likely HRCW not explicitly identified]}
-""",
-            "ppe": """
-Check PPE requirements in this SWMS.
-Return JSON: {"ppe_specified": true/false, "ppe_items": [list of PPE required], "task_specific_ppe": {task: [ppe_items]}, "gaps": [missing PPE]}
-""",
-            "emergency": """
-Check emergency procedures in this SWMS.
-Return JSON: {"emergency_procedures": true/false, "contact_numbers": true/false, "evacuation_plan": true/false, "first_aid": true/false, "issues": [list of missing items]}
-""",
-            "signatures": """
-Check for worker consultation and sign-off provisions.
-Return JSON: {"sign_off_section": true/false, "consultation_evidence": true/false, "responsible_person": "name or not specified", "issues": [list of problems]}
-""",
-            "hierarchy": """
-Check if control measures follow the hierarchy of controls.
-Return JSON: {"hierarchy_followed": true/false, "elimination": [examples], "substitution": [examples], "engineering": [examples], "administrative": [examples], "ppe": [examples], "issues": [problems with hierarchy application]}
-""",
-            "hazards": """
-Quick check of hazard identification completeness.
-Return JSON: {"hazards_identified": [list of hazards], "site_specific": true/false, "generic_only": true/false, "missing_common": [likely missing hazards], "count": number}
-"""
-        }
+        # Normalise check_type to an ordered list of distinct check types
+        single_check = isinstance(check_type, str) and check_type != "all" and "," not in check_type
+        if check_type == "all":
+            check_types = list(QUICK_CHECK_PROMPTS)
+        elif isinstance(check_type, str):
+            check_types = [c.strip() for c in check_type.split(",") if c.strip()]
+        else:
+            check_types = list(check_type)
+        check_types = list(dict.fromkeys(check_types))
+        invalid = [c for c in check_types if c not in QUICK_CHECK_PROMPTS]
+        if invalid or not check_types:
+            return {
+                "status": "error",
+                "message": f"Invalid check_type: {invalid or check_type}. Valid options: {list(QUICK_CHECK_PROMPTS.keys())} or \"all\""
+            }
         
-        # Get the appropriate prompt
-        prompt = check_prompts.get(check_type)
-        if not prompt:
+        # Get the Gemini file object directly
+        try:
+            gemini_file = await gateway.get_file(document_id)
+        except Exception as e:
             return {
                 "status": "error",
-                "message": f"Invalid check_type: {check_type}. Valid options: {list(check_prompts.keys())}"
+                "message": f"Document not found or unable to access: {document_id}. Error: {str(e)}"
             }
         
-        # Add instruction for clean JSON
-        prompt += "\n\nReturn ONLY valid JSON, no markdown formatting or explanations."
+        prompt = build_quick_check_prompt(check_types)
         
-        # Generate analysis using Gemini model
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=[
-                prompt,
-                gemini_file
-            ]
+        # Serve repeated checks of the same SWMS content from the result cache
+        cache_key = result_cache.make_key(
+            document_content_hash(gemini_file), "quick_check_swms",
+            {"check_types": check_types}, prompt, 'gemini-2.5-flash', REGULATORY_MANIFEST.version
         )
+        cached_result = cache_lookup(cache, cache_key)
+        if cached_result:
+            return _quick_check_response(cached_result, check_types, single_check)
         
-        # Parse the JSON response
+        # One schema-constrained model pass answers every requested check
         try:
-            response_text = response.text.strip()
-            if response_text.startswith('```json'):
-                response_text = response_text[7:-3].strip()
-            elif response_text.startswith('```'):
-                response_text = response_text[3:-3].strip()
-            
-            result = json.loads(response_text)
-            
-            return {
-                "status": "success",
-                "check_type": check_type,
-                "result": result,
-                "quick_summary": _generate_quick_summary(check_type, result)
-            }
-            
-        except json.JSONDecodeError as e:
-            # Still return the text result if JSON parsing fails
+            merged = await generate_structured(
+                gateway, 'gemini-2.5-flash', [prompt, gemini_file], quick_check_schema(check_types)
+            )
+        except StructuredOutputError as e:
+            # Still return the text result if the response is invalid after a repair attempt
             return {
                 "status": "success",
                 "check_type": check_type,
-                "result": {"raw_response": response.text},
-                "note": "Response was not valid JSON"
+                "result": {"raw_response": e.raw_text},
+                "note": f"Response was not valid JSON: {e}"
             }
+
+        results = {
+            name: {"result": merged[name], "quick_summary": _generate_quick_summary(name, merged[name])}
+            for name in check_types
+        }
+        stored = cache_store(cache_key, {
+            "status": "success",
+            "check_types": check_types,
+            "results": results
+        })
+        return _quick_check_response(stored, check_types, single_check)
         
     except Exception as e:
         return {
@@ -1448,6 +1710,21 @@ Return JSON: {"hazards_identified": [list of hazards], "site_specific": true/fal
             "message": f"Failed to perform quick check: {str(e)}"
         }
 
+def _quick_check_response(merged: Dict[str, Any], check_types: List[str], single_check: bool) -> Dict[str, Any]:
+    """Shape a merged quick check result; a single check keeps the per-check response format"""
+    if not single_check or merged.get("status") != "success":
+        return merged
+    check = merged["results"][check_types[0]]
+    response = {
+        "status": "success",
+        "check_type": check_types[0],
+        "result": check["result"],
+        "quick_summary": check["quick_summary"]
+    }
+    if "cache" in merged:
+        response["cache"] = merged["cache"]
+    return response
+
 def _generate_quick_summary(check_type: str, result: Dict) -> str:
     """Generate a quick text summary based on check results."""
     summaries = {
@@ -1558,7 +1835,7 @@ async def get_server_status() -> Dict[str, Any]:
     if api_configured and client:
         try:
             # Simple test to verify API connectivity
-            models = client.models.list()
+            models = await client.aio.models.list()
             api_status = "active" if models else "connection_failed"
         except Exception as e:
             api_status = f"error: {str(e)}"
@@ -1572,6 +1849,9 @@ async def get_server_status() -> Dict[str, Any]:
             "configured": api_configured,
             "status": api_status
         },
+        "result_cache": result_cache.stats(),
+        "document_registry": document_registry.stats(),
+        "rate_limits": gateway.rate_limiter.stats(),
         "capabilities": [
             "upload_swms_document",
             "upload_swms_from_url",
@@ -1580,6 +1860,7 @@ async def get_server_status() -> Dict[str, Any]:
             "analyze_swms_compliance",
             "analyze_swms_custom",
             "get_compliance_score",
+            "rescore",
             "quick_check_swms",
             "list_jurisdictions",
             "get_server_status",
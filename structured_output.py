@@ -0,0 +1,186 @@
+"""
+Structured Output Module - Schema-constrained JSON generation and validation
+
+Requests JSON constrained to a response schema, validates it locally and, if
+the response still does not parse or match the schema, makes one cheap repair
+call that sends only the bad response, the errors and the schema (never the
+SWMS document or regulatory context) instead of re-running the analysis.
+"""
+
+import os
+import json
+from typing import Any, Dict, List, Optional
+
+from google.genai import types
+
+# Model used for repair calls; the input is small, so a lighter model suffices
+REPAIR_MODEL = os.getenv("SWMS_REPAIR_MODEL", "gemini-2.5-flash-lite")
+
+SCHEMA_TYPES = {
+    "OBJECT": dict,
+    "ARRAY": list,
+    "STRING": str,
+    "BOOLEAN": bool,
+    "INTEGER": int,
+    "NUMBER": (int, float)
+}
+
+# Reported validation errors per response, to keep repair prompts small
+MAX_REPORTED_ERRORS = 20
+
+
+class StructuredOutputError(ValueError):
+    """A response that could not be parsed or validated, even after a repair attempt"""
+
+    def __init__(self, message: str, raw_text: str, errors: List[str]):
+        super().__init__(message)
+        self.raw_text = raw_text
+        self.errors = errors
+
+
+def extract_json(text: str) -> Any:
+    """
+    Parse JSON from a model response, tolerating markdown fences and surrounding prose.
+
+    Raises:
+        json.JSONDecodeError: If no JSON value can be parsed
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else text[3:]
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+        text = text.strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # Fall back to the outermost object or array in the text
+        starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+        if not starts:
+            raise
+        start = min(starts)
+        end = text.rfind("}" if text[start] == "{" else "]")
+        if end <= start:
+            raise
+        return json.loads(text[start:end + 1])
+
+
+def validate(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """Errors for data against a response schema (types, required properties, enums and ranges)"""
+    expected = schema.get("type")
+    python_type = SCHEMA_TYPES.get(expected)
+    if data is None:
+        return [] if schema.get("nullable") else [f"{path}: expected {expected}, got null"]
+    # bool is a subclass of int, so it never satisfies INTEGER or NUMBER
+    if python_type and (not isinstance(data, python_type) or (isinstance(data, bool) and expected != "BOOLEAN")):
+        return [f"{path}: expected {expected}, got {type(data).__name__}"]
+
+    errors = []
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: {data!r} is not one of {schema['enum']}")
+    if "minimum" in schema and isinstance(data, (int, float)) and data < schema["minimum"]:
+        errors.append(f"{path}: {data} is below the minimum {schema['minimum']}")
+    if "maximum" in schema and isinstance(data, (int, float)) and data > schema["maximum"]:
+        errors.append(f"{path}: {data} is above the maximum {schema['maximum']}")
+
+    if expected == "OBJECT":
+        for name in schema.get("required", []):
+            if name not in data:
+                errors.append(f"{path}.{name}: missing required property")
+        for name, property_schema in schema.get("properties", {}).items():
+            if name in data:
+                errors.extend(validate(data[name], property_schema, f"{path}.{name}"))
+    elif expected == "ARRAY" and "items" in schema:
+        for index, item in enumerate(data):
+            errors.extend(validate(item, schema["items"], f"{path}[{index}]"))
+    return errors
+
+
+def parse_response(text: str, schema: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    Parse and validate a response.
+
+    Raises:
+        StructuredOutputError: If the text is not JSON or does not match the schema
+    """
+    try:
+        data = extract_json(text)
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"Response was not valid JSON: {e}", text, [str(e)])
+    errors = validate(data, schema) if schema else []
+    if errors:
+        raise StructuredOutputError(
+            f"Response did not match the schema ({len(errors)} errors)", text, errors[:MAX_REPORTED_ERRORS]
+        )
+    return data
+
+
+def json_config(
+    schema: Optional[Dict[str, Any]] = None,
+    cached_content: Optional[str] = None
+) -> types.GenerateContentConfig:
+    """Generation config requesting (schema-constrained) JSON output"""
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=schema,
+        cached_content=cached_content
+    )
+
+
+async def repair_response(gateway, text: str, errors: List[str], schema: Optional[Dict[str, Any]]) -> Any:
+    """Ask REPAIR_MODEL to fix an invalid response, then parse and validate the result"""
+    prompt = (
+        "The following response was supposed to be JSON"
+        + (" matching the schema below" if schema else "")
+        + " but is invalid.\n\nErrors:\n"
+        + "\n".join(f"- {error}" for error in errors)
+        + (f"\n\nSchema:\n{json.dumps(schema)}" if schema else "")
+        + f"\n\nResponse:\n{text}\n\n"
+        "Return the corrected JSON only. Keep every finding from the response; "
+        "only fix the structure, types and missing fields."
+    )
+    response = await gateway.generate(model=REPAIR_MODEL, contents=[prompt], config=json_config(schema))
+    return parse_response(response.text, schema)
+
+
+async def generate_structured(
+    gateway,
+    model: str,
+    contents: List[Any],
+    schema: Optional[Dict[str, Any]] = None,
+    cached_content: Optional[str] = None,
+    repair: bool = True
+) -> Any:
+    """
+    Generate JSON constrained to a response schema, repairing an invalid response once.
+
+    Args:
+        gateway: The Gemini gateway making the calls
+        model: Model for the main request
+        contents: Request contents
+        schema: Response schema (None requests free-form JSON)
+        cached_content: Cached context name to use for the main request
+        repair: Make one repair call if the response is invalid
+
+    Returns:
+        The parsed, validated response
+
+    Raises:
+        StructuredOutputError: If the response (and its repair) is invalid
+    """
+    response = await gateway.generate(
+        model=model,
+        contents=contents,
+        config=json_config(schema, cached_content)
+    )
+    try:
+        return parse_response(response.text, schema)
+    except StructuredOutputError as e:
+        if not repair:
+            raise
+        print(f"Warning: Repairing invalid {model} response: {e}")
+        try:
+            return await repair_response(gateway, e.raw_text, e.errors, schema)
+        except Exception as repair_error:
+            errors = getattr(repair_error, "errors", [str(repair_error)])
+            raise StructuredOutputError(f"Repair failed: {repair_error}", e.raw_text, errors)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Concurrency test: simultaneous analyses must overlap rather than queue behind
+a blocked event loop. Uses a local stand-in gateway with a fixed model latency.
+"""
+
+import json
+import asyncio
+import time
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+import server
+from compliance_scoring import AreaScoreStore
+from result_cache import ResultCache
+
+MODEL_LATENCY_SECONDS = 0.5
+CONCURRENT_CALLS = 6
+
+
+class SlowGateway:
+    """Stand-in for the Gemini gateway whose model calls take MODEL_LATENCY_SECONDS"""
+
+    async def get_file(self, name):
+        return SimpleNamespace(name=name, uri=f"https://example.test/{name}", mime_type="application/pdf", size_bytes=50000)
+
+    async def generate(self, model, contents, config=None):
+        await asyncio.sleep(MODEL_LATENCY_SECONDS)
+        schema = getattr(config, "response_schema", None)
+        return SimpleNamespace(text=json.dumps(sample_response(schema) if schema else {"status": "success"}))
+
+
+def sample_response(schema):
+    """Minimal response that satisfies a response schema"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if schema["type"] == "OBJECT":
+        return {name: sample_response(schema["properties"][name]) for name in schema.get("required", [])}
+    return {"ARRAY": [], "STRING": "", "BOOLEAN": False, "INTEGER": 0, "NUMBER": 0}[schema["type"]]
+
+
+def tool_function(tool):
+    """The undecorated coroutine function behind an @mcp.tool()"""
+    return getattr(tool, "fn", tool)
+
+
+async def run_concurrently(calls):
+    """Run the calls together, returning (results, wall time, event-loop heartbeat count)"""
+    heartbeats = 0
+    done = asyncio.Event()
+
+    async def heartbeat():
+        nonlocal heartbeats
+        while not done.is_set():
+            heartbeats += 1
+            await asyncio.sleep(0.05)
+
+    beat = asyncio.create_task(heartbeat())
+    started = time.perf_counter()
+    results = await asyncio.gather(*calls)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await beat
+    return results, elapsed, heartbeats
+
+
+def test_analyses_overlap():
+    saved = (server.gateway, server.client, server.r2_context, server.result_cache, server.area_scores)
+    # Results and area scores go to a scratch directory, not the server's /tmp stores
+    work_dir = tempfile.TemporaryDirectory()
+    server.gateway, server.client, server.r2_context = SlowGateway(), object(), None
+    server.result_cache = ResultCache(cache_dir=Path(work_dir.name) / "results")
+    server.area_scores = AreaScoreStore(path=Path(work_dir.name) / "area_scores.json")
+    try:
+        analyses = [
+            lambda: tool_function(server.analyze_swms_compliance)("files/doc", "nsw", cache="bypass"),
+            lambda: tool_function(server.analyze_swms_text)("Task: install roof sheeting", "Roof SWMS", "nsw"),
+            lambda: tool_function(server.analyze_swms_custom)("files/doc", "List all PPE"),
+            lambda: tool_function(server.get_compliance_score)("files/doc", cache="bypass"),
+            lambda: tool_function(server.quick_check_swms)("files/doc", "hrcw", cache="bypass")
+        ]
+        for analysis in analyses:
+            results, elapsed, heartbeats = asyncio.run(
+                run_concurrently([analysis() for _ in range(CONCURRENT_CALLS)])
+            )
+            assert all(result["status"] != "error" for result in results), results
+            # Serial execution would take CONCURRENT_CALLS * MODEL_LATENCY_SECONDS
+            assert elapsed < MODEL_LATENCY_SECONDS * 2, f"calls did not overlap ({elapsed:.2f}s)"
+            # The event loop kept serving other work while the analyses were in flight
+            assert heartbeats >= int(MODEL_LATENCY_SECONDS / 0.05) // 2
+    finally:
+        server.gateway, server.client, server.r2_context, server.result_cache, server.area_scores = saved
+        work_dir.cleanup()
+
+
+if __name__ == "__main__":
+    test_analyses_overlap()
+    print(f"✅ {CONCURRENT_CALLS} simultaneous calls of each analysis tool overlapped")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side cached regulatory context, against a local stand-in
+for the Gemini API (no network or API key needed)
+"""
+
+import asyncio
+import itertools
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import r2_context
+from r2_context import LocalDirectoryBackend, R2ContextManager
+from regulatory_manifest import RegulatoryManifest
+
+
+class FakeFiles:
+    """Stand-in for client.aio.files"""
+
+    def __init__(self):
+        self.files = {}
+
+    async def upload(self, file, config=None):
+        name = f"files/{len(self.files) + 1}"
+        self.files[name] = SimpleNamespace(
+            name=name,
+            uri=f"https://example.test/{name}",
+            mime_type=config.mime_type if config else "application/pdf",
+            display_name=config.display_name if config else None,
+            expiration_time=datetime.now(timezone.utc) + timedelta(hours=48),
+            state=None
+        )
+        return self.files[name]
+
+    async def get(self, name):
+        if name not in self.files:
+            raise LookupError(f"{name} not found")
+        return self.files[name]
+
+
+class FakeCaches:
+    """Stand-in for client.aio.caches, with create/get/update call counts"""
+
+    def __init__(self, fail_create=False):
+        self.caches = {}
+        self._names = itertools.count(1)
+        self.fail_create = fail_create
+        self.calls = {"create": 0, "get": 0, "update": 0}
+
+    def _expiry(self, ttl):
+        return datetime.now(timezone.utc) + timedelta(seconds=int(ttl.rstrip("s")))
+
+    async def create(self, model, config):
+        self.calls["create"] += 1
+        if self.fail_create:
+            raise ValueError("Cached content is too small")
+        name = f"cachedContents/{next(self._names)}"
+        self.caches[name] = SimpleNamespace(
+            name=name,
+            model=model,
+            contents=config.contents,
+            expire_time=self._expiry(config.ttl)
+        )
+        return self.caches[name]
+
+    async def get(self, name):
+        self.calls["get"] += 1
+        if name not in self.caches:
+            raise LookupError(f"{name} not found")
+        return self.caches[name]
+
+    async def update(self, name, config):
+        self.calls["update"] += 1
+        self.caches[name].expire_time = self._expiry(config.ttl)
+        return self.caches[name]
+
+
+class FakeModels:
+    """Stand-in for client.aio.models (token counting only)"""
+
+    async def count_tokens(self, model, contents):
+        return SimpleNamespace(total_tokens=1000)
+
+
+class FakeClient:
+    def __init__(self, caches=None):
+        self.aio = SimpleNamespace(files=FakeFiles(), caches=caches or FakeCaches(), models=FakeModels())
+
+
+def make_corpus(base_dir: Path) -> RegulatoryManifest:
+    """Write a two-document corpus and return its manifest"""
+    for doc_path, content in {
+        "national/model-code.pdf": b"%PDF-1.4 national",
+        "nsw/nsw-regulation.pdf": b"%PDF-1.4 nsw"
+    }.items():
+        (base_dir / doc_path).parent.mkdir(parents=True, exist_ok=True)
+        (base_dir / doc_path).write_bytes(content)
+    return RegulatoryManifest.from_directory(base_dir)
+
+
+@contextmanager
+def isolated_work_dir():
+    """Temporary directory holding the file cache, restoring r2_context.CACHE_DIR afterwards"""
+    saved = r2_context.CACHE_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        r2_context.CACHE_DIR = Path(tmp) / "cache"
+        try:
+            yield Path(tmp)
+        finally:
+            r2_context.CACHE_DIR = saved
+
+
+def make_manager(work_dir: Path, client: FakeClient) -> R2ContextManager:
+    """Context manager over a local corpus, with its file cache in work_dir"""
+    corpus_dir = work_dir / "corpus"
+    manifest = make_corpus(corpus_dir)
+    manager = R2ContextManager(client, manifest=manifest, backend=LocalDirectoryBackend(corpus_dir))
+    manager.context_mode = "files"
+    return manager
+
+
+def test_cached_context_created_once_and_reused():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeClient()
+        manager = make_manager(work_dir, client)
+
+        async def run():
+            first = await manager.get_cached_context("nsw", "Assess this SWMS")
+            second = await manager.get_cached_context("nsw", "Assess this SWMS")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first is not None and first.name == second.name
+        assert manager.manifest.version in first.key
+        assert client.aio.caches.calls["create"] == 1
+        # Prompt text plus both regulatory documents are in the cached content
+        assert len(client.aio.caches.caches[first.name].contents[0].parts) == 3
+        assert len(first.context["included"]) == 2
+
+
+def test_prompt_version_and_jurisdiction_get_separate_caches():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeClient()
+        manager = make_manager(work_dir, client)
+
+        async def run():
+            return [
+                await manager.get_cached_context("nsw", "Prompt v1"),
+                await manager.get_cached_context("nsw", "Prompt v2"),
+                await manager.get_cached_context("national", "Prompt v1")
+            ]
+
+        names = {cached.name for cached in asyncio.run(run())}
+        assert len(names) == 3
+
+
+def test_cached_context_ttl_is_extended_near_expiry():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeClient()
+        manager = make_manager(work_dir, client)
+
+        async def run():
+            cached = await manager.get_cached_context("nsw", "Assess this SWMS")
+            client.aio.caches.caches[cached.name].expire_time = datetime.now(timezone.utc) + timedelta(seconds=30)
+            manager.file_cache["cached_contents"][cached.key]["expire_time"] = (
+                datetime.now(timezone.utc) + timedelta(seconds=30)
+            ).isoformat()
+            return cached, await manager.get_cached_context("nsw", "Assess this SWMS")
+
+        cached, refreshed = asyncio.run(run())
+        assert refreshed.name == cached.name
+        assert client.aio.caches.calls["update"] == 1
+        assert refreshed.expire_time > datetime.now(timezone.utc) + timedelta(minutes=30)
+
+
+def test_cached_context_recreated_when_deleted_server_side():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeClient()
+        manager = make_manager(work_dir, client)
+        cached = asyncio.run(manager.get_cached_context("nsw", "Assess this SWMS"))
+        del client.aio.caches.caches[cached.name]
+
+        # A new process loads the stored entry from disk and must confirm it first
+        restarted = make_manager(work_dir, client)
+        recreated = asyncio.run(restarted.get_cached_context("nsw", "Assess this SWMS"))
+        assert recreated is not None and recreated.name != cached.name
+        assert client.aio.caches.calls["get"] == 1
+        assert client.aio.caches.calls["create"] == 2
+
+
+def test_falls_back_when_caching_unsupported():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeClient(FakeCaches(fail_create=True))
+        manager = make_manager(work_dir, client)
+
+        async def run():
+            cached = await manager.get_cached_context("nsw", "Assess this SWMS")
+            again = await manager.get_cached_context("nsw", "Assess this SWMS")
+            plan = await manager.get_prompt_context("nsw")
+            return cached, again, plan
+
+        cached, again, plan = asyncio.run(run())
+        assert cached is None and again is None
+        # The failure is remembered, so the second call does not retry creation
+        assert client.aio.caches.calls["create"] == 1
+        # Inline context is still available for the fallback path
+        assert len(plan.items) == 2
+
+
+if __name__ == "__main__":
+    for test in [
+        test_cached_context_created_once_and_reused,
+        test_prompt_version_and_jurisdiction_get_separate_caches,
+        test_cached_context_ttl_is_extended_near_expiry,
+        test_cached_context_recreated_when_deleted_server_side,
+        test_falls_back_when_caching_unsupported
+    ]:
+        test()
+        print(f"✅ {test.__name__}")
@@ -20,6 +20,7 @@ async def test_tools():
         "analyze_swms_compliance",
         "analyze_swms_custom",
         "get_compliance_score",
+        "rescore",
         "quick_check_swms",
         "list_jurisdictions",
         "get_server_status",
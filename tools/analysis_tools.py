@@ -5,9 +5,10 @@ Tools for analyzing and improving SWMS documents.
 """
 
 from typing import Dict, Any, Optional, List
-from google import genai
 from google.genai import types
 
+from gemini_gateway import get_gateway
+
 from .utils import (
     format_success,
     format_error,
@@ -49,10 +50,8 @@ async def suggest_swms_improvements(
         if not check_api_configured():
             return format_error("Gemini API key not configured", "API_KEY_NOT_CONFIGURED")
         
-        # Get API client
-        import os
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        client = genai.Client(api_key=api_key)
+        # Shared Gemini gateway (one client and connection pool per process)
+        gateway = get_gateway()
         
         # Format incident context
         incident_context = get_incident_context(incident_history or [])
@@ -65,7 +64,7 @@ async def suggest_swms_improvements(
         
         # Get the Gemini file object to get the proper URI
         try:
-            gemini_file = client.files.get(name=document_id)
+            gemini_file = await gateway.get_file(document_id)
             file_uri = gemini_file.uri
         except Exception as e:
             return format_error(f"Document not found: {document_id}. Error: {str(e)}", "DOCUMENT_NOT_FOUND")
@@ -79,7 +78,7 @@ async def suggest_swms_improvements(
             prompt
         ]
         
-        response = await client.aio.models.generate_content(
+        response = await gateway.generate(
             model="gemini-2.0-flash-exp",
             contents=contents,
             config=types.GenerateContentConfig(
@@ -197,10 +196,8 @@ async def extract_hazards_from_image(
         if not check_api_configured():
             return format_error("Gemini API key not configured", "API_KEY_NOT_CONFIGURED")
         
-        # Get API client
-        import os
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        client = genai.Client(api_key=api_key)
+        # Shared Gemini gateway (one client and connection pool per process)
+        gateway = get_gateway()
         
         # Format the prompt
         prompt = HAZARD_EXTRACTION_PROMPT.format(
@@ -217,7 +214,7 @@ async def extract_hazards_from_image(
         # Generate with Gemini
         contents = [image_part, prompt]
         
-        response = await client.aio.models.generate_content(
+        response = await gateway.generate(
             model="gemini-2.0-flash-exp",
             contents=contents,
             config=types.GenerateContentConfig(
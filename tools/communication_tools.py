@@ -5,9 +5,10 @@ Tools for creating toolbox talks and worker summaries from SWMS documents.
 """
 
 from typing import Dict, Any, Optional
-from google import genai
 from google.genai import types
 
+from gemini_gateway import get_gateway
+
 from .utils import (
     format_success,
     format_error,
@@ -50,10 +51,8 @@ async def generate_toolbox_talk(
         if not check_api_configured():
             return format_error("Gemini API key not configured", "API_KEY_NOT_CONFIGURED")
         
-        # Get API client
-        import os
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        client = genai.Client(api_key=api_key)
+        # Shared Gemini gateway (one client and connection pool per process)
+        gateway = get_gateway()
         
         # Format the prompt
         prompt = TOOLBOX_TALK_PROMPT.format(
@@ -63,7 +62,7 @@ async def generate_toolbox_talk(
         
         # Get the Gemini file object to get the proper URI
         try:
-            gemini_file = client.files.get(name=document_id)
+            gemini_file = await gateway.get_file(document_id)
             file_uri = gemini_file.uri
         except Exception as e:
             return format_error(f"Document not found: {document_id}. Error: {str(e)}", "DOCUMENT_NOT_FOUND")
@@ -77,7 +76,7 @@ async def generate_toolbox_talk(
             prompt
         ]
         
-        response = await client.aio.models.generate_content(
+        response = await gateway.generate(
             model="gemini-2.0-flash-exp",
             contents=contents,
             config=types.GenerateContentConfig(
@@ -163,10 +162,8 @@ async def create_worker_summary(
         if not check_api_configured():
             return format_error("Gemini API key not configured", "API_KEY_NOT_CONFIGURED")
         
-        # Get API client
-        import os
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        client = genai.Client(api_key=api_key)
+        # Shared Gemini gateway (one client and connection pool per process)
+        gateway = get_gateway()
         
         # Get visual instructions
         visual_instructions = get_visual_instructions(include_symbols)
@@ -181,7 +178,7 @@ async def create_worker_summary(
         
         # Get the Gemini file object to get the proper URI
         try:
-            gemini_file = client.files.get(name=document_id)
+            gemini_file = await gateway.get_file(document_id)
             file_uri = gemini_file.uri
         except Exception as e:
             return format_error(f"Document not found: {document_id}. Error: {str(e)}", "DOCUMENT_NOT_FOUND")
@@ -195,7 +192,7 @@ async def create_worker_summary(
             prompt
         ]
         
-        response = await client.aio.models.generate_content(
+        response = await gateway.generate(
             model="gemini-2.0-flash-exp",
             contents=contents,
             config=types.GenerateContentConfig(
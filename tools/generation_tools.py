@@ -5,9 +5,10 @@ Tools for generating SWMS documents from descriptions.
 """
 
 from typing import Dict, Any, Optional
-from google import genai
 from google.genai import types
 
+from gemini_gateway import get_gateway
+
 from .utils import (
     format_success, 
     format_error, 
@@ -57,21 +58,25 @@ async def generate_swms_from_description(
         site_context = get_site_context(site_type)
         terminology = get_jurisdiction_terminology(jurisdiction)
         
-        # Import dependencies
-        import os
-        from r2_context import R2ContextManager
+        # Shared Gemini gateway and regulatory context manager
+        gateway = get_gateway()
+        r2_context = gateway.context
         
-        # Get API client
-        api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-        client = genai.Client(api_key=api_key)
-        r2_context = R2ContextManager(client)
+        model = "gemini-2.0-flash-exp"
         
-        # Get regulatory context with error handling
+        # Get regulatory context with error handling: the jurisdiction's server-side
+        # cached bundle if available, otherwise files (or clauses) relevant to this job
+        cached_context = None
+        context_plan = None
+        context_files = []
         try:
-            context_files = await r2_context.get_context_for_jurisdiction(jurisdiction)
+            cached_context = await r2_context.get_cached_context(jurisdiction, model=model)
+            if not cached_context:
+                retrieval_query = f"{job_description} {trade_type} {' '.join(trade_context['hazards'])}"
+                context_plan = await r2_context.get_prompt_context(jurisdiction, retrieval_query)
+                context_files = context_plan.items
         except Exception as e:
             print(f"Warning: Could not load regulatory context: {e}")
-            context_files = []
         
         # Format the prompt
         prompt = GENERATE_SWMS_PROMPT.format(
@@ -90,7 +95,7 @@ async def generate_swms_from_description(
         # Generate with Gemini
         contents = []
         
-        # Add regulatory documents as context (file objects directly)
+        # Add regulatory documents as context (file objects or clause text directly)
         for file_obj in context_files:
             if file_obj:  # Only add valid file objects
                 contents.append(file_obj)
@@ -99,14 +104,15 @@ async def generate_swms_from_description(
         contents.append(prompt)
         
         # Generate response
-        response = await client.aio.models.generate_content(
-            model="gemini-2.0-flash-exp",
+        response = await gateway.generate(
+            model=model,
             contents=contents,
             config=types.GenerateContentConfig(
                 temperature=0.7,
                 top_p=0.95,
                 max_output_tokens=8000,
-                response_mime_type="text/plain"
+                response_mime_type="text/plain",
+                cached_content=cached_context.name if cached_context else None
             )
         )
         
@@ -130,7 +136,11 @@ async def generate_swms_from_description(
                 "site_type": site_type,
                 "jurisdiction": jurisdiction,
                 "terminology": terminology,
-                "regulatory_context_included": len(context_files) > 0,
+                "regulatory_context_included": bool(cached_context) or len(context_files) > 0,
+                "regulatory_context": (
+                    cached_context.context if cached_context else
+                    context_plan.summary() if context_plan else None
+                ),
                 "document_stats": {
                     "total_lines": len(lines),
                     "sections": len(sections),